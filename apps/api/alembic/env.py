@@ -1,29 +1,32 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from logging.config import fileConfig
 import os
 import sys
 
 from os.path import abspath, dirname
 from alembic import context
-from sqlalchemy import engine_from_config, pool
-sys.path.insert(0, abspath(dirname(dirname(__file__))))
-sys.path.insert(0, abspath(os.getcwd()))
+from sqlalchemy import MetaData, engine_from_config, pool
+from sqlalchemy.engine import Connection
+
+_API_ROOT = abspath(dirname(dirname(__file__)))
+if _API_ROOT not in sys.path:
+    sys.path.insert(0, _API_ROOT)
 from app.env import load_env
-from app.db import Base
-from app import models  # noqa: F401
 
 
 load_env()
 
 config = context.config
 
-if config.config_file_name is not None:
+# Test harnesses that drive Alembic repeatedly can set ALEMBIC_SKIP_LOGGING=1
+# to keep their own logging setup and skip re-reading alembic.ini each time.
+if os.getenv("ALEMBIC_SKIP_LOGGING") != "1" and config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-target_metadata = Base.metadata
-
 
+@lru_cache(maxsize=1)
 def get_database_url() -> str:
     url = os.getenv("DATABASE_URL")
     if not url:
@@ -31,11 +34,20 @@ def get_database_url() -> str:
     return url
 
 
+def get_target_metadata() -> MetaData:
+    # Imported lazily so commands that never reach a migration run do not
+    # pay for loading the ORM models.
+    from app.db import Base
+    from app import models  # noqa: F401
+
+    return Base.metadata
+
+
 def run_migrations_offline() -> None:
     url = get_database_url()
     context.configure(
         url=url,
-        target_metadata=target_metadata,
+        target_metadata=get_target_metadata(),
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -44,20 +56,34 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+def do_run_migrations(connection: Connection) -> None:
+    context.configure(connection=connection, target_metadata=get_target_metadata())
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
 def run_migrations_online() -> None:
+    # Callers that run several Alembic commands (tests, scripts) can hand in
+    # an open connection via config.attributes and reuse it across runs.
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+        return
+
     configuration = config.get_section(config.config_ini_section) or {}
     configuration["sqlalchemy.url"] = get_database_url()
+    # Migration statements are one-shot DDL, so caching their compiled form
+    # only costs time and memory.
     connectable = engine_from_config(
         configuration,
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
-    )
+    ).execution_options(compiled_cache=None)
 
+    # One connection serves every revision in this run
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
-
-        with context.begin_transaction():
-            context.run_migrations()
+        do_run_migrations(connection)
 
 
 if context.is_offline_mode():
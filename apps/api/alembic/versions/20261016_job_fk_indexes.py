@@ -0,0 +1,50 @@
+"""index job_mappings.job_id and job_runs.job_id
+
+Revision ID: 20261016_job_fk_indexes
+Revises: 20250115_assets_checksum_nullable
+Create Date: 2026-10-16 00:00:00
+
+"""
+from __future__ import annotations
+
+from alembic import op
+
+
+revision = "20261016_job_fk_indexes"
+down_revision = "20250115_assets_checksum_nullable"
+branch_labels = None
+depends_on = None
+
+
+# Foreign key columns without an index force a sequential scan of the
+# child table whenever a parent job is deleted or its id is updated.
+# job_tle_config and job_return_address key on job_id already.
+FK_INDEXES = (
+    ("ix_job_mappings_job_id", "job_mappings"),
+    ("ix_job_runs_job_id", "job_runs"),
+)
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block, and
+    # avoids holding a write lock on the tables while the index builds.
+    with op.get_context().autocommit_block():
+        for index_name, table_name in FK_INDEXES:
+            op.create_index(
+                index_name,
+                table_name,
+                ["job_id"],
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for index_name, table_name in FK_INDEXES:
+            op.drop_index(
+                index_name,
+                table_name=table_name,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -22,56 +22,119 @@ Removal targets:
    - MMD (D3 AB CA) - Medium Modification Control (external medium maps)
 """
 
+import mmap
+import os
+import re
 import struct
 from typing import Tuple, List
 
 # AFP Carriage Control character
 CC = 0x5A
+_CC_BYTE = bytes([CC])  # search needle for resyncing on non-SF bytes
+
+# Structured field identifiers are packed into 24-bit integers
+# (0xD3A85F for D3 A8 5F) so the parse loop can compare them without
+# allocating a 3-byte slice per field.
 
 # Structured field types to potentially remove (when they contain S-numbers)
 SF_TYPES_TO_CHECK = {
-    bytes([0xD3, 0xA8, 0x5F]): "BNG (Begin Named Page Group)",
-    bytes([0xD3, 0xA9, 0x5F]): "ENG (End Named Page Group)",
-    bytes([0xD3, 0xA8, 0xFB]): "BIE (Begin Index Element)",
-    bytes([0xD3, 0xA9, 0xFB]): "EIE (End Index Element)",
-    bytes([0xD3, 0xAF, 0x5F]): "IEL (Index Element Link)",
+    0xD3A85F: "BNG (Begin Named Page Group)",
+    0xD3A95F: "ENG (End Named Page Group)",
+    0xD3A8FB: "BIE (Begin Index Element)",
+    0xD3A9FB: "EIE (End Index Element)",
+    0xD3AF5F: "IEL (Index Element Link)",
 }
 
 # Structured field types to always remove (resource mappings)
 SF_TYPES_TO_REMOVE = {
-    bytes([0xD3, 0xAB, 0xCC]): "MDR (Map Data Resource)",
-    bytes([0xD3, 0xAB, 0xCA]): "MMD (Medium Modification Control)",
+    0xD3ABCC: "MDR (Map Data Resource)",
+    0xD3ABCA: "MMD (Medium Modification Control)",
 }
 
+# Per-type removal counters live in fixed list slots during the cleaning
+# loops and are turned into the name -> count stats dict once at the end.
+# Slots for SF_TYPES_TO_CHECK come first so clean_afp can use a prefix.
+_COUNTER_NAMES = list(SF_TYPES_TO_CHECK.values()) + list(SF_TYPES_TO_REMOVE.values())
+_COUNTER_INDEX = {sf_type: i for i, sf_type in enumerate([*SF_TYPES_TO_CHECK, *SF_TYPES_TO_REMOVE])}
+
 # Page-related structured fields for tracking BlankPD pages
-SF_BPG = bytes([0xD3, 0xA8, 0xAF])  # Begin Page
-SF_EPG = bytes([0xD3, 0xA9, 0xAF])  # End Page
-SF_GAD = bytes([0xD3, 0xB1, 0x8A])  # Graphics Data
-SF_MPS = bytes([0xD3, 0xB1, 0x9B])  # Map Page Segment
+SF_BPG = 0xD3A8AF  # Begin Page
+SF_EPG = 0xD3A9AF  # End Page
+SF_GAD = 0xD3B18A  # Graphics Data
+SF_MPS = 0xD3B19B  # Map Page Segment
 
 # BlankPD in EBCDIC (0xC2 0xD3 0xC1 0xD5 0xD2 0xD7 0xC4)
 BLANKPD_EBCDIC = bytes([0xC2, 0xD3, 0xC1, 0xD5, 0xD2, 0xD7, 0xC4])
 
-# S-number pattern: EBCDIC 'S' (0xE2) followed by EBCDIC digits (0xF0-0xF9)
+# Pages whose name contains "Blank" are BlankPD candidates. cp500 is a
+# single-byte code page, so the name is matched in EBCDIC without decoding.
+_BLANK_NAME_EBCDIC = "Blank".encode('cp500')
+
+# S-number pattern: EBCDIC 'S' (0xE2) followed by 7 EBCDIC digits (0xF0-0xF9).
+# Compiled once so the scan runs in the regex engine's C loop rather than a
+# per-byte Python loop.
+_S_NUMBER_RE = re.compile(rb'\xE2[\xF0-\xF9]{7}')
+
+# Translation for displaying S-numbers: 'S' and digits map to ASCII and all
+# other bytes are deleted.
+_S_NUMBER_DISPLAY = bytes.maketrans(bytes([0xE2, *range(0xF0, 0xFA)]), b'S0123456789')
+_S_NUMBER_DISPLAY_DROP = bytes(b for b in range(256) if b != 0xE2 and not 0xF0 <= b <= 0xF9)
+
+
+def _sf_header_pattern(sf_types) -> 're.Pattern[bytes]':
+    """Compile a pattern matching a structured field header of any of sf_types."""
+    alternatives = b'|'.join(re.escape(sf_type.to_bytes(3, 'big')) for sf_type in sf_types)
+    return re.compile(rb'\x5A..(?:' + alternatives + rb')', re.DOTALL)
+
+
+# Bulk prefilters: one regex scan over the whole buffer tells whether any
+# field header that could lead to a removal exists at all. When none does,
+# the per-field checks are skipped and the input is returned as-is.
+_CLEAN_CANDIDATE_RE = _sf_header_pattern(SF_TYPES_TO_CHECK)
+_CLEAN_ADVANCED_CANDIDATE_RE = _sf_header_pattern(
+    [*SF_TYPES_TO_CHECK, *SF_TYPES_TO_REMOVE, SF_GAD, SF_MPS]
+)
+
+# Every field type clean_afp_advanced acts on, page boundaries included. The
+# offsets of its matches let the walk skip decoding all other fields.
+_ADVANCED_FIELD_RE = _sf_header_pattern(
+    [*SF_TYPES_TO_CHECK, *SF_TYPES_TO_REMOVE, SF_BPG, SF_EPG, SF_GAD, SF_MPS]
+)
+
+
+def _count_structured_fields(data: bytes, include_gaps: bool = False) -> int:
+    """
+    Count the structured fields in data, walking headers only.
+
+    With include_gaps, each run of non-SF bytes (and a truncated trailing
+    header) counts as one entry too, as clean_afp_advanced does.
+    """
+    count = 0
+    data_len = len(data)
+    offset = 0
+    while offset < data_len:
+        if data[offset] != CC:
+            if include_gaps:
+                count += 1
+            offset = data.find(_CC_BYTE, offset + 1)
+            if offset == -1:
+                break
+            continue
+        if offset + 6 > data_len:
+            if include_gaps:
+                count += 1
+            break
+        count += 1
+        offset += 1 + ((data[offset + 1] << 8) | data[offset + 2])
+    return count
+
+
 def _is_s_number(data: bytes) -> bool:
     """Check if data contains an S-number pattern (S followed by 7 digits in EBCDIC)."""
-    if len(data) < 8:
-        return False
-
-    # Look for EBCDIC 'S' (0xE2) followed by 7 EBCDIC digits (0xF0-0xF9)
-    for i in range(len(data) - 7):
-        if data[i] == 0xE2:  # EBCDIC 'S'
-            is_s_number = True
-            for j in range(1, 8):
-                if not (0xF0 <= data[i + j] <= 0xF9):
-                    is_s_number = False
-                    break
-            if is_s_number:
-                return True
-    return False
-
-
-def _parse_structured_field(data: bytes, offset: int) -> Tuple[int, bytes, bytes, int]:
+    return _S_NUMBER_RE.search(data) is not None
+
+
+def _parse_structured_field(data: bytes, offset: int) -> Tuple[int, int, bytes, int]:
     """
     Parse an AFP structured field at the given offset.
 
@@ -80,28 +143,28 @@ def _parse_structured_field(data: bytes, offset: int) -> Tuple[int, bytes, bytes
     AFP structured field format:
     - 1 byte: Carriage control (0x5A)
     - 2 bytes: Length (big-endian, includes these 2 bytes + 3-byte SF ID + data)
-    - 3 bytes: Structured field identifier
+    - 3 bytes: Structured field identifier (returned packed as a 24-bit int)
     - N bytes: Data (length - 5 bytes)
     """
     if offset >= len(data):
-        return (0, b'', b'', offset)
+        return (0, 0, b'', offset)
 
     # Check for carriage control
     if data[offset] != CC:
         # Skip to next 0x5A
-        next_cc = data.find(bytes([CC]), offset + 1)
+        next_cc = data.find(_CC_BYTE, offset + 1)
         if next_cc == -1:
-            return (0, b'', b'', len(data))
-        return (0, b'', b'', next_cc)
+            return (0, 0, b'', len(data))
+        return (0, 0, b'', next_cc)
 
     if offset + 6 > len(data):
-        return (0, b'', b'', len(data))
+        return (0, 0, b'', len(data))
 
     # Parse length (2 bytes, big-endian)
     length = struct.unpack('>H', data[offset + 1:offset + 3])[0]
 
     # Parse SF type (3 bytes)
-    sf_type = data[offset + 3:offset + 6]
+    sf_type = (data[offset + 3] << 16) | (data[offset + 4] << 8) | data[offset + 5]
 
     # Calculate data length
     data_length = length - 5  # length includes 2-byte length + 3-byte SF ID
@@ -129,69 +192,85 @@ def clean_afp(input_data: bytes, verbose: bool = False) -> Tuple[bytes, dict]:
         Tuple of (cleaned_data, stats_dict)
         stats_dict contains counts of removed fields by type
     """
-    output = bytearray()
-    stats = {name: 0 for name in SF_TYPES_TO_CHECK.values()}
-    stats["total_removed"] = 0
-    stats["total_kept"] = 0
-
+    # Offsets of every header that could be an index/grouping field. The walk
+    # below still follows the length chain (a match may sit inside some other
+    # field's payload), but only fields starting at one of these offsets need
+    # their type decoded and checked.
+    candidates = {m.start() for m in _CLEAN_CANDIDATE_RE.finditer(input_data)}
+    if not candidates:
+        stats = {name: 0 for name in SF_TYPES_TO_CHECK.values()}
+        stats["total_removed"] = 0
+        stats["total_kept"] = _count_structured_fields(input_data)
+        return bytes(input_data), stats
+
+    counts = [0] * len(SF_TYPES_TO_CHECK)
+    total_removed = 0
+    total_kept = 0
+
+    # Kept bytes are tracked as (start, end) ranges and copied out once at
+    # the end; a run only breaks where a field is removed.
+    spans = []
+    run_start = 0
+
+    # The field walk is inlined rather than calling _parse_structured_field
+    # per field: it runs once per structured field across the whole file, and
+    # the payload only needs slicing for the few index/grouping types checked.
+    data_len = len(input_data)
     offset = 0
-    while offset < len(input_data):
-        total_length, sf_type, sf_data, next_offset = _parse_structured_field(input_data, offset)
-
-        if total_length == 0:
-            # Skip byte or end of file
-            if next_offset > offset:
-                output.extend(input_data[offset:next_offset])
+    while offset < data_len:
+        if input_data[offset] != CC:
+            # Non-SF bytes: copy through to the next carriage control
+            next_offset = input_data.find(_CC_BYTE, offset + 1)
+            if next_offset == -1:
+                next_offset = data_len
             offset = next_offset
             continue
 
-        # Check if this is an index/grouping SF with S-number
-        should_remove = False
-        if sf_type in SF_TYPES_TO_CHECK:
-            if _is_s_number(sf_data):
-                should_remove = True
-                sf_name = SF_TYPES_TO_CHECK[sf_type]
-                stats[sf_name] += 1
-                stats["total_removed"] += 1
+        if offset + 6 > data_len:
+            # Truncated header at end of file (kept as-is)
+            break
 
-                if verbose:
-                    # Decode S-number for display
-                    s_num = ""
-                    for b in sf_data:
-                        if b == 0xE2:
-                            s_num += "S"
-                        elif 0xF0 <= b <= 0xF9:
-                            s_num += chr(b - 0xF0 + ord('0'))
-                    print(f"Removing {sf_name}: {s_num} at offset 0x{offset:x}")
-
-        if not should_remove:
-            # Keep this structured field
-            output.extend(input_data[offset:offset + total_length])
-            stats["total_kept"] += 1
+        length = (input_data[offset + 1] << 8) | input_data[offset + 2]
+        next_offset = offset + 1 + length
 
-        offset = next_offset
+        # Check if this is an index/grouping SF with S-number; searching the
+        # payload in place rather than slicing a copy of it
+        if offset in candidates and _S_NUMBER_RE.search(input_data, offset + 6, next_offset) is not None:
+            sf_type = (input_data[offset + 3] << 16) | (input_data[offset + 4] << 8) | input_data[offset + 5]
+            counts[_COUNTER_INDEX[sf_type]] += 1
+            total_removed += 1
 
-    return bytes(output), stats
+            if verbose:
+                sf_name = SF_TYPES_TO_CHECK[sf_type]
+                # Decode S-number for display
+                sf_data = input_data[offset + 6:next_offset]
+                s_num = sf_data.translate(_S_NUMBER_DISPLAY, _S_NUMBER_DISPLAY_DROP).decode('ascii')
+                print(f"Removing {sf_name}: {s_num} at offset 0x{offset:x}")
+
+            if offset > run_start:
+                spans.append((run_start, offset))
+            run_start = next_offset
+        else:
+            total_kept += 1
 
+        offset = next_offset
 
-def _get_page_name(sf_data: bytes) -> str:
-    """Extract page name from BPG/EPG structured field data."""
-    # Page name starts after the flags (2 bytes) and is typically 8 bytes in EBCDIC
-    if len(sf_data) < 10:
-        return ""
-    try:
-        name_bytes = sf_data[2:10]  # Skip 2-byte flags, name is 8 bytes
-        return name_bytes.decode('cp500').strip()
-    except:
-        return ""
+    if run_start < data_len:
+        spans.append((run_start, data_len))
 
+    stats = dict(zip(SF_TYPES_TO_CHECK.values(), counts))
+    stats["total_removed"] = total_removed
+    stats["total_kept"] = total_kept
+    return _join_spans(input_data, spans), stats
 
-def _contains_gad_or_mps(fields: List[Tuple[int, bytes, bytes]]) -> bool:
-    """Check if a list of structured fields contains GAD or MPS fields."""
-    for _, sf_type, _ in fields:
-        if sf_type == SF_GAD or sf_type == SF_MPS:
-            return True
-    return False
+
+def _join_spans(data: bytes, spans: List[Tuple[int, int]]) -> bytes:
+    """Concatenate the (start, end) byte ranges of data into a single bytes object."""
+    if len(spans) == 1 and spans[0] == (0, len(data)) and type(data) is bytes:
+        # Nothing was removed
+        return data
+    view = memoryview(data)
+    return b''.join([view[start:end] for start, end in spans])
 
 
 def clean_afp_advanced(input_data: bytes, verbose: bool = False) -> Tuple[bytes, dict]:
@@ -208,98 +287,157 @@ def clean_afp_advanced(input_data: bytes, verbose: bool = False) -> Tuple[bytes,
     Returns:
         Tuple of (cleaned_data, stats_dict)
     """
-    # First pass: collect all structured fields with their positions
-    fields = []
-    offset = 0
-    while offset < len(input_data):
-        total_length, sf_type, sf_data, next_offset = _parse_structured_field(input_data, offset)
+    spans, stats = _clean_afp_advanced_spans(input_data, verbose)
+    return _join_spans(input_data, spans), stats
 
-        if total_length == 0:
-            if next_offset > offset:
-                # Non-SF data
-                fields.append((offset, next_offset - offset, None, None, input_data[offset:next_offset]))
+
+def _clean_afp_advanced_spans(input_data: bytes, verbose: bool = False) -> Tuple[List[Tuple[int, int]], dict]:
+    """
+    Run the clean_afp_advanced passes without materializing the output.
+
+    Returns:
+        Tuple of (kept_spans, stats_dict) where kept_spans lists the
+        (start, end) byte ranges of input_data that make up the output
+    """
+    if _CLEAN_ADVANCED_CANDIDATE_RE.search(input_data) is None:
+        # No removable field types and no GAD/MPS, so no BlankPD page
+        # qualifies for removal either
+        stats = {name: 0 for name in _COUNTER_NAMES}
+        stats["BlankPD pages"] = 0
+        stats["total_removed"] = 0
+        stats["total_kept"] = _count_structured_fields(input_data, include_gaps=True)
+        return ([(0, len(input_data))] if input_data else []), stats
+
+    # As in clean_afp, the walk follows the length chain and only decodes
+    # fields that start at one of these offsets
+    field_offsets = {m.start() for m in _ADVANCED_FIELD_RE.finditer(input_data)}
+
+    # Single pass over the fields. BlankPD pages are only known to be
+    # removable at their EPG, so output state is snapshotted at each BPG and
+    # rolled back if the page turns out to be removed; nothing beyond the
+    # current page is buffered.
+    data_len = len(input_data)
+    counts = [0] * len(_COUNTER_NAMES)
+    total_removed = 0
+    total_kept = 0
+    pages_removed = 0
+
+    # Fields are contiguous, so kept output is tracked as runs of bytes
+    # broken only by removed fields (see clean_afp)
+    spans = []
+    run_start = 0
+
+    # Verbose messages are collected so page markings are reported before
+    # field removals, and removals inside a dropped page are not reported
+    page_log = []
+    removal_log = []
+
+    page = None  # Output state at the open page's BPG, see above
+    page_is_blank = False
+    page_has_gad_or_mps = False
+
+    field_index = 0
+    offset = 0
+    while offset < data_len:
+        if input_data[offset] != CC:
+            # Non-SF data
+            next_offset = input_data.find(_CC_BYTE, offset + 1)
+            if next_offset == -1:
+                next_offset = data_len
+            total_kept += 1
+            field_index += 1
             offset = next_offset
             continue
 
-        fields.append((offset, total_length, sf_type, sf_data, input_data[offset:offset + total_length]))
-        offset = next_offset
+        if offset + 6 > data_len:
+            total_kept += 1
+            field_index += 1
+            break
+
+        length = (input_data[offset + 1] << 8) | input_data[offset + 2]
+        next_offset = offset + 1 + length
 
-    # Second pass: identify BlankPD page ranges to remove
-    pages_to_remove = set()  # Set of (start_idx, end_idx) for pages to remove
-    current_page_start = None
-    current_page_name = None
-    current_page_fields = []
+        if offset not in field_offsets:
+            total_kept += 1
+            field_index += 1
+            offset = next_offset
+            continue
+
+        sf_type = (input_data[offset + 3] << 16) | (input_data[offset + 4] << 8) | input_data[offset + 5]
 
-    for i, (offset, length, sf_type, sf_data, raw_data) in enumerate(fields):
         if sf_type == SF_BPG:
-            current_page_start = i
-            current_page_name = _get_page_name(sf_data) if sf_data else ""
-            current_page_fields = [(i, sf_type, sf_data)]
+            # A BPG inside an unterminated page abandons that page (kept as is)
+            page = (field_index, offset, len(spans), run_start, counts[:],
+                    total_removed, total_kept, len(removal_log))
+            # Page name is the 8 bytes after the 2-byte flags
+            page_is_blank = (
+                min(next_offset, data_len) - offset >= 16
+                and input_data.find(_BLANK_NAME_EBCDIC, offset + 8, offset + 16) != -1
+            )
+            page_has_gad_or_mps = False
         elif sf_type == SF_EPG:
-            if current_page_start is not None:
-                current_page_fields.append((i, sf_type, sf_data))
-
-                # Check if this is a BlankPD page with GAD/MPS
-                if current_page_name == "BlankPD" or (current_page_name and "Blank" in current_page_name):
-                    if _contains_gad_or_mps(current_page_fields):
-                        pages_to_remove.add((current_page_start, i))
-                        if verbose:
-                            print(f"Marking BlankPD page for removal: indices {current_page_start}-{i}")
-
-                current_page_start = None
-                current_page_name = None
-                current_page_fields = []
-        elif current_page_start is not None and sf_type:
-            current_page_fields.append((i, sf_type, sf_data))
-
-    # Third pass: build output, skipping removed fields and pages
-    output = bytearray()
-    stats = {name: 0 for name in SF_TYPES_TO_CHECK.values()}
-    stats.update({name: 0 for name in SF_TYPES_TO_REMOVE.values()})
-    stats["BlankPD pages"] = 0
-    stats["total_removed"] = 0
-    stats["total_kept"] = 0
-
-    # Flatten page ranges for quick lookup
-    indices_to_remove = set()
-    for start_idx, end_idx in pages_to_remove:
-        for idx in range(start_idx, end_idx + 1):
-            indices_to_remove.add(idx)
-        stats["BlankPD pages"] += 1
-
-    for i, (offset, length, sf_type, sf_data, raw_data) in enumerate(fields):
-        # Skip if part of a BlankPD page
-        if i in indices_to_remove:
-            stats["total_removed"] += 1
-            continue
+            if page is not None and page_is_blank and page_has_gad_or_mps:
+                (page_index, page_offset, span_count, run_start, counts,
+                 total_removed, total_kept, log_count) = page
+                del spans[span_count:]
+                del removal_log[log_count:]
+                if page_offset > run_start:
+                    spans.append((run_start, page_offset))
+                run_start = next_offset
+                total_removed += field_index - page_index + 1
+                pages_removed += 1
+                if verbose:
+                    page_log.append(f"Marking BlankPD page for removal: indices {page_index}-{field_index}")
+                page = None
+                field_index += 1
+                offset = next_offset
+                continue
+            page = None
+        elif sf_type == SF_GAD or sf_type == SF_MPS:
+            if page is not None:
+                page_has_gad_or_mps = True
 
         should_remove = False
 
-        if sf_type is not None:
-            # Check for S-number fields
-            if sf_type in SF_TYPES_TO_CHECK:
-                if _is_s_number(sf_data):
-                    should_remove = True
-                    sf_name = SF_TYPES_TO_CHECK[sf_type]
-                    stats[sf_name] += 1
-                    if verbose:
-                        print(f"Removing {sf_name} at offset 0x{offset:x}")
-
-            # Check for always-remove fields
-            if sf_type in SF_TYPES_TO_REMOVE:
+        # Check for S-number fields
+        if sf_type in SF_TYPES_TO_CHECK:
+            if _S_NUMBER_RE.search(input_data, offset + 6, next_offset) is not None:
                 should_remove = True
-                sf_name = SF_TYPES_TO_REMOVE[sf_type]
-                stats[sf_name] += 1
+                counts[_COUNTER_INDEX[sf_type]] += 1
                 if verbose:
-                    print(f"Removing {sf_name} at offset 0x{offset:x}")
+                    removal_log.append(f"Removing {SF_TYPES_TO_CHECK[sf_type]} at offset 0x{offset:x}")
+
+        # Check for always-remove fields
+        if sf_type in SF_TYPES_TO_REMOVE:
+            should_remove = True
+            counts[_COUNTER_INDEX[sf_type]] += 1
+            if verbose:
+                removal_log.append(f"Removing {SF_TYPES_TO_REMOVE[sf_type]} at offset 0x{offset:x}")
 
         if should_remove:
-            stats["total_removed"] += 1
+            total_removed += 1
+            if offset > run_start:
+                spans.append((run_start, offset))
+            run_start = next_offset
         else:
-            output.extend(raw_data)
-            stats["total_kept"] += 1
+            total_kept += 1
 
-    return bytes(output), stats
+        field_index += 1
+        offset = next_offset
+
+    if run_start < data_len:
+        spans.append((run_start, data_len))
+
+    for message in page_log:
+        print(message)
+    for message in removal_log:
+        print(message)
+
+    stats = dict(zip(_COUNTER_NAMES, counts))
+    stats["BlankPD pages"] = pages_removed
+    stats["total_removed"] = total_removed
+    stats["total_kept"] = total_kept
+    return spans, stats
 
 
 def clean_afp_file(input_path: str, output_path: str = None, verbose: bool = False) -> dict:
@@ -317,20 +455,37 @@ def clean_afp_file(input_path: str, output_path: str = None, verbose: bool = Fal
     if output_path is None:
         output_path = input_path + ".cleaned"
 
+    # Map the input instead of reading it into memory, and write the kept
+    # ranges straight from the mapping, so neither the input nor the cleaned
+    # output is ever held as a whole in a Python object.
     with open(input_path, 'rb') as f:
-        input_data = f.read()
-
-    print(f"Input file: {input_path}")
-    print(f"Input size: {len(input_data):,} bytes")
-
-    cleaned_data, stats = clean_afp_advanced(input_data, verbose=verbose)
+        if os.fstat(f.fileno()).st_size == 0:
+            input_data = b''  # empty files cannot be mapped
+        else:
+            input_data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
-    with open(output_path, 'wb') as f:
-        f.write(cleaned_data)
+    try:
+        input_size = len(input_data)
+        print(f"Input file: {input_path}")
+        print(f"Input size: {input_size:,} bytes")
+
+        spans, stats = _clean_afp_advanced_spans(input_data, verbose=verbose)
+
+        output_size = 0
+        view = memoryview(input_data)
+        try:
+            with open(output_path, 'wb') as f:
+                for start, end in spans:
+                    output_size += f.write(view[start:end])
+        finally:
+            view.release()
+    finally:
+        if isinstance(input_data, mmap.mmap):
+            input_data.close()
 
     print(f"\nOutput file: {output_path}")
-    print(f"Output size: {len(cleaned_data):,} bytes")
-    print(f"Size reduction: {len(input_data) - len(cleaned_data):,} bytes")
+    print(f"Output size: {output_size:,} bytes")
+    print(f"Size reduction: {input_size - output_size:,} bytes")
     print(f"\nRemoval statistics:")
     for name, count in stats.items():
         if name not in ("total_removed", "total_kept") and count > 0:
@@ -12,10 +12,18 @@ Compatible with mainframe processing, reblocking, and AFP viewers.
 
 import struct
 from datetime import datetime
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import BinaryIO, Iterable, List, Dict, Optional, Tuple
+
+from app.bilevel import image_to_bilevel
 
 # Carriage control (Machine Carriage Control for AFP)
 CC = 0x5A
+_CC_BYTE = bytes([CC])
+
+# Big-endian 2-byte field (SF lengths, sizes, resolutions), compiled once
+_U16 = struct.Struct('>H')
+
 
 # Structured Field Identifiers (per AFP Architecture Reference)
 SF_BDT = bytes([0xD3, 0xA8, 0xC6])  # Begin Document (D3 A8 C6)
@@ -65,6 +73,10 @@ SF_ENG = bytes([0xD3, 0xA9, 0xDF])  # End Named Page Group
 SF_MCF = bytes([0xD3, 0xAB, 0x8A])  # Map Coded Font
 
 
+# The 3 flag bytes (all zero) that start the data of most fields built here
+_SF_FLAGS = bytes([0x00, 0x00, 0x00])
+
+
 def _sf(sf_id: bytes, data: bytes = b'') -> bytes:
     """Build structured field with carriage control (MCC format).
 
@@ -73,12 +85,59 @@ def _sf(sf_id: bytes, data: bytes = b'') -> bytes:
     Length = length_field(2) + SF_ID(3) + data = 5 + len(data)
     """
     length = 5 + len(data)
-    return bytes([CC]) + struct.pack('>H', length) + sf_id + data
+    # One join allocates the result once instead of once per '+'
+    return b''.join((_CC_BYTE, _U16.pack(length), sf_id, data))
+
+
+def _sf_append(out: bytearray, sf_id: bytes, data: bytes = b'') -> None:
+    """Append a structured field to out (same layout as _sf), without building it separately."""
+    out.append(CC)
+    out += _U16.pack(5 + len(data))
+    out += sf_id
+    out += data
+
+
+# cp500 covers exactly the Latin-1 repertoire, so encoding to Latin-1 and
+# translating the bytes gives the same result as the cp500 codec, faster.
+_LATIN1_TO_EBCDIC = bytes.maketrans(
+    bytes(range(256)), bytes(range(256)).decode('latin-1').encode('cp500')
+)
+
+
+def _encode_ebcdic(text: str) -> bytes:
+    """Encode text as EBCDIC (code page 500)."""
+    return text.encode('latin-1').translate(_LATIN1_TO_EBCDIC)
 
 
 def _to_ebcdic(text: str, length: int = 8) -> bytes:
     """Convert text to EBCDIC, padded/truncated to specified length."""
-    return text.upper()[:length].ljust(length).encode('cp500')
+    return _encode_ebcdic(text.upper()[:length].ljust(length))
+
+
+# Name-only fields (3 flag bytes + 8-byte EBCDIC name) differ only in the
+# name, so everything in front of it is built once per field type
+_NAMED_SF_PREFIX = {
+    sf_id: _CC_BYTE + _U16.pack(5 + 3 + 8) + sf_id + _SF_FLAGS
+    for sf_id in (
+        SF_BDT, SF_EDT, SF_BMM, SF_EMM, SF_BPG, SF_EPG, SF_ERS,
+        SF_BNG, SF_ENG, SF_IPS, SF_BPS, SF_EPS, SF_BIO,
+    )
+}
+
+
+def _build_named_sf(sf_id: bytes, name_ebcdic: bytes) -> bytes:
+    """
+    Build a name-only structured field from an already encoded name.
+
+    Format: 3 flag bytes + 8-byte EBCDIC name (as produced by _to_ebcdic)
+    """
+    return _NAMED_SF_PREFIX[sf_id] + name_ebcdic
+
+
+def _append_named_sf(out: bytearray, sf_id: bytes, name_ebcdic: bytes) -> None:
+    """Append the field built by _build_named_sf to out."""
+    out += _NAMED_SF_PREFIX[sf_id]
+    out += name_ebcdic
 
 
 def _build_bdt(document_name: str = "DOCUMENT") -> bytes:
@@ -87,8 +146,7 @@ def _build_bdt(document_name: str = "DOCUMENT") -> bytes:
 
     Format: 3 flag bytes + 8-char EBCDIC document name
     """
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(document_name, 8)
-    return _sf(SF_BDT, data)
+    return _build_named_sf(SF_BDT, _to_ebcdic(document_name, 8))
 
 
 def _build_edt(document_name: str = "DOCUMENT") -> bytes:
@@ -97,8 +155,7 @@ def _build_edt(document_name: str = "DOCUMENT") -> bytes:
 
     Format: 3 flag bytes + 8-char EBCDIC document name
     """
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(document_name, 8)
-    return _sf(SF_EDT, data)
+    return _build_named_sf(SF_EDT, _to_ebcdic(document_name, 8))
 
 
 def _build_bmm(map_name: str = "") -> bytes:
@@ -108,8 +165,7 @@ def _build_bmm(map_name: str = "") -> bytes:
 
     Format: 3 flag bytes + 8-char EBCDIC name (spaces if empty)
     """
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(map_name, 8)
-    return _sf(SF_BMM, data)
+    return _build_named_sf(SF_BMM, _to_ebcdic(map_name, 8))
 
 
 def _build_emm(map_name: str = "") -> bytes:
@@ -118,8 +174,7 @@ def _build_emm(map_name: str = "") -> bytes:
 
     Format: 3 flag bytes + 8-char EBCDIC name (spaces if empty)
     """
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(map_name, 8)
-    return _sf(SF_EMM, data)
+    return _build_named_sf(SF_EMM, _to_ebcdic(map_name, 8))
 
 
 def _build_bpg(page_name: str = "PAGE0001") -> bytes:
@@ -128,8 +183,7 @@ def _build_bpg(page_name: str = "PAGE0001") -> bytes:
 
     Format: 3 flag bytes + 8-char EBCDIC page name
     """
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(page_name, 8)
-    return _sf(SF_BPG, data)
+    return _build_named_sf(SF_BPG, _to_ebcdic(page_name, 8))
 
 
 def _build_epg(page_name: str = "PAGE0001") -> bytes:
@@ -138,10 +192,22 @@ def _build_epg(page_name: str = "PAGE0001") -> bytes:
 
     Format: 3 flag bytes + 8-char EBCDIC page name
     """
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(page_name, 8)
-    return _sf(SF_EPG, data)
+    return _build_named_sf(SF_EPG, _to_ebcdic(page_name, 8))
+
+
+# PGD data: flags and X/Y units base, then XpgSize / YpgSize as 3-byte fields
+# (zero high byte) in L-units (8.5 * 240 = 2040, 11 * 240 = 2640)
+_PGD_RECORD = struct.Struct('>9sxHxH')
+_PGD_FLAGS_AND_BASE = bytes([
+    0x00, 0x00, 0x00,  # Flag bytes
+    # XpgBase and YpgBase - L-units per unit base (240 per inch * 10 = 2400)
+    # Using 2400 L-units per 10 inches
+    0x00, 0x09, 0x60,
+    0x00, 0x09, 0x60,
+])
 
 
+@lru_cache(maxsize=32)
 def _build_pgd(width: int = 2040, height: int = 2640, resolution: int = 240) -> bytes:
     """
     Build Page Descriptor (PGD) structured field.
@@ -155,27 +221,48 @@ def _build_pgd(width: int = 2040, height: int = 2640, resolution: int = 240) ->
     - XpgSize (3 bytes) - page width
     - YpgSize (3 bytes) - page height
     """
+    return _sf(SF_PGD, _PGD_RECORD.pack(_PGD_FLAGS_AND_BASE, width, height))
+
+
+@lru_cache(maxsize=64)
+def _tle_name_prefix(attribute_name: str) -> bytes:
+    """
+    Build the fixed start of a TLE's data: flags and the name triplet.
+
+    Documents repeat the same few attribute names on every page, so this is
+    cached per name.
+    """
     data = bytearray()
 
-    # Flag bytes
+    # Flag bytes (columns 7-9)
     data.extend([0x00, 0x00, 0x00])
 
-    # XpgBase and YpgBase - L-units per unit base (240 per inch * 10 = 2400)
-    # Using 2400 L-units per 10 inches
-    data.extend([0x00, 0x09, 0x60])  # 2400 in 3 bytes
-    data.extend([0x00, 0x09, 0x60])  # 2400 in 3 bytes
+    # Name triplet (0x02) - Crawford format
+    # Structure: length(1) + ID(1) + FQN_type(1) + format(1) + name(N)
+    name_ebcdic = _encode_ebcdic(attribute_name[:250])
+    name_triplet_len = 4 + len(name_ebcdic)  # 4 bytes overhead + name
 
-    # XpgSize - page width in L-units (8.5 * 240 = 2040)
-    data.extend([0x00])
-    data.extend(struct.pack('>H', width))
+    data.append(name_triplet_len)  # Length of triplet
+    data.append(0x02)  # Triplet ID - FQN
+    data.append(0x0B)  # FQN Type - Attribute GID
+    data.append(0x00)  # Format
+    data.extend(name_ebcdic)
 
-    # YpgSize - page height in L-units (11 * 240 = 2640)
-    data.extend([0x00])
-    data.extend(struct.pack('>H', height))
+    return bytes(data)
 
-    return _sf(SF_PGD, bytes(data))
 
+# Value triplet header for each possible value length (values are cut to 250)
+_TLE_VALUE_HEADERS = [
+    bytes([
+        value_len + 4,  # Length (4 bytes overhead + value)
+        0x36,  # Triplet ID - Attribute Value
+        0x00, 0x00,  # Reserved bytes (Crawford format)
+    ])
+    for value_len in range(251)
+]
 
+
+@lru_cache(maxsize=16384)
 def _build_tle(attribute_name: str, attribute_value: str) -> bytes:
     """
     Build Tag Logical Element (TLE) structured field.
@@ -193,36 +280,76 @@ def _build_tle(attribute_name: str, attribute_value: str) -> bytes:
         attribute_name: The TLE attribute name
         attribute_value: The TLE attribute value (can be empty string)
     """
-    data = bytearray()
-
-    # Flag bytes (columns 7-9)
-    data.extend([0x00, 0x00, 0x00])
+    result = bytearray()
+    _append_tle(result, attribute_name, attribute_value)
+    return bytes(result)
 
-    # Name triplet (0x02) - Crawford format
-    # Structure: length(1) + ID(1) + FQN_type(1) + format(1) + name(N)
-    name_ebcdic = attribute_name[:250].encode('cp500')
-    name_triplet_len = 4 + len(name_ebcdic)  # 4 bytes overhead + name
 
-    name_triplet = bytearray()
-    name_triplet.append(name_triplet_len)  # Length of triplet
-    name_triplet.append(0x02)  # Triplet ID - FQN
-    name_triplet.append(0x0B)  # FQN Type - Attribute GID
-    name_triplet.append(0x00)  # Format
-    name_triplet.extend(name_ebcdic)
-    data.extend(name_triplet)
+def _append_tle(out: bytearray, attribute_name: str, attribute_value: str) -> None:
+    """Append the TLE built by _build_tle to out."""
+    # Flags and name triplet
+    name_part = _tle_name_prefix(attribute_name)
 
     # Value triplet (0x36) - Crawford format
     # Structure: length(1) + ID(1) + reserved(2) + value(N)
     # Always include value triplet even if value is empty
-    value_ebcdic = attribute_value[:250].encode('cp500') if attribute_value else b''
-    value_triplet = bytearray()
-    value_triplet.append(len(value_ebcdic) + 4)  # Length (4 bytes overhead + value)
-    value_triplet.append(0x36)  # Triplet ID - Attribute Value
-    value_triplet.extend([0x00, 0x00])  # Reserved bytes (Crawford format)
-    value_triplet.extend(value_ebcdic)
-    data.extend(value_triplet)
+    value_ebcdic = _encode_ebcdic(attribute_value[:250]) if attribute_value else b''
+    value_header = _TLE_VALUE_HEADERS[len(value_ebcdic)]
+
+    out.append(CC)
+    out += _U16.pack(5 + len(name_part) + len(value_header) + len(value_ebcdic))
+    out += SF_TLE
+    out += name_part
+    out += value_header
+    out += value_ebcdic
+
+
+# TLE attributes written for every page, in order
+_PAGE_TLE_FIELDS = (
+    'mailing_name',
+    'mailing_addr1',
+    'mailing_addr2',
+    'mailing_addr3',
+    'return_addr1',
+    'return_addr2',
+    'return_addr3',
+)
+
+# Attributes that usually carry the same value on every page of a mailing (the
+# sender's return address); their complete TLEs come from _build_tle's cache
+_SHARED_VALUE_TLE_FIELDS = frozenset({'return_addr1', 'return_addr2', 'return_addr3'})
+
+
+def _append_page_tles(out: bytearray, tle_data: Dict) -> None:
+    """
+    Append one TLE per _PAGE_TLE_FIELDS attribute to out (empty value if missing).
 
-    return _sf(SF_TLE, bytes(data))
+    Same records as calling _append_tle per field, with the loop-invariant
+    parts (name prefixes, lookups) taken out of the per-field work.
+    """
+    pack_length = _U16.pack
+    value_headers = _TLE_VALUE_HEADERS
+    for field_name, name_part, shared_value in _page_tle_prefixes():
+        value = tle_data.get(field_name, '')
+        if shared_value:
+            out += _build_tle(field_name, value)
+            continue
+        value_ebcdic = _encode_ebcdic(value[:250]) if value else b''
+        out.append(CC)
+        out += pack_length(5 + len(name_part) + 4 + len(value_ebcdic))
+        out += SF_TLE
+        out += name_part
+        out += value_headers[len(value_ebcdic)]
+        out += value_ebcdic
+
+
+@lru_cache(maxsize=1)
+def _page_tle_prefixes() -> Tuple[Tuple[str, bytes, bool], ...]:
+    """(attribute name, flags + name triplet, shared value) for each of _PAGE_TLE_FIELDS."""
+    return tuple(
+        (name, _tle_name_prefix(name), name in _SHARED_VALUE_TLE_FIELDS)
+        for name in _PAGE_TLE_FIELDS
+    )
 
 
 def _build_nop_comment(comment: str) -> bytes:
@@ -230,8 +357,11 @@ def _build_nop_comment(comment: str) -> bytes:
     comment_padded = comment[:86].ljust(86)
 
     # EBCDIC version
-    data = bytes([0x00, 0x00, 0x00]) + comment_padded.encode('cp500')
-    return _sf(SF_NOP, data)
+    return _sf(SF_NOP, _SF_FLAGS + _encode_ebcdic(comment_padded))
+
+
+# Header comment of every generate_afp_with_resources document
+_NOP_GENERATED_BY = _build_nop_comment("Generated by AdhocPrintStudio")
 
 
 # ============== Resource Group Functions ==============
@@ -250,22 +380,27 @@ def _build_brs(resource_name: str, resource_type: int = 0x03) -> bytes:
             0x41 = Code Page
             0xFB = Object Container
     """
-    data = bytearray()
-    data.extend([0x00, 0x00, 0x00])  # Flags
-    data.extend(_to_ebcdic(resource_name, 8))  # Resource name
+    result = bytearray()
+    _append_brs(result, _to_ebcdic(resource_name, 8), resource_type)
+    return bytes(result)
+
+
+def _append_brs(out: bytearray, name_ebcdic: bytes, resource_type: int = 0x03) -> None:
+    """Append the BRS built by _build_brs, for an already encoded name, to out."""
     # Resource Object Type triplet (0x21) - per AFP spec
     # Format: length(1) + triplet_id(1) + resource_type(1) + reserved(7)
-    data.append(0x0A)  # Triplet length (10 bytes)
-    data.append(0x21)  # Resource Object Type triplet ID
-    data.append(resource_type)  # Resource type (0x03 = Page Segment, etc.)
-    data.extend([0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])  # Reserved bytes
-    return _sf(SF_BRS, bytes(data))
+    triplet = bytes([
+        0x0A,  # Triplet length (10 bytes)
+        0x21,  # Resource Object Type triplet ID
+        resource_type,  # Resource type (0x03 = Page Segment, etc.)
+        0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,  # Reserved bytes
+    ])
+    _sf_append(out, SF_BRS, b''.join((_SF_FLAGS, name_ebcdic, triplet)))
 
 
 def _build_ers(resource_name: str) -> bytes:
     """Build End Resource (ERS) structured field."""
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(resource_name, 8)
-    return _sf(SF_ERS, data)
+    return _build_named_sf(SF_ERS, _to_ebcdic(resource_name, 8))
 
 
 def _build_bng(group_name: str) -> bytes:
@@ -273,14 +408,16 @@ def _build_bng(group_name: str) -> bytes:
     Build Begin Named Page Group (BNG) structured field.
     Used to group pages for indexing and document boundaries.
     """
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(group_name, 8)
-    return _sf(SF_BNG, data)
+    return _build_named_sf(SF_BNG, _to_ebcdic(group_name, 8))
 
 
 def _build_eng(group_name: str) -> bytes:
     """Build End Named Page Group (ENG) structured field."""
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(group_name, 8)
-    return _sf(SF_ENG, data)
+    return _build_named_sf(SF_ENG, _to_ebcdic(group_name, 8))
+
+
+# Code page named in every MCF font mapping, encoded once
+_MCF_CODE_PAGE = _to_ebcdic("T1V10500", 8)
 
 
 def _build_mcf(font_mappings: list = None) -> bytes:
@@ -296,21 +433,20 @@ def _build_mcf(font_mappings: list = None) -> bytes:
             (0x01, "X0C10000"),  # Local ID 1 -> Courier 10 pitch
         ]
 
-    data = bytearray()
-    data.extend([0x00, 0x00, 0x00])  # Flags
+    parts = [_SF_FLAGS]
 
     for local_id, font_name in font_mappings:
         # Font mapping triplet (0x8D = MCF-1 Triplet)
-        triplet = bytearray()
-        triplet.append(0x16)  # Triplet length (22 bytes)
-        triplet.append(0x8D)  # MCF-1 triplet ID
-        triplet.append(local_id)  # Local font ID
-        triplet.extend([0x00])  # Section ID
-        triplet.extend(_to_ebcdic(font_name, 8))  # Coded font name
-        triplet.extend(_to_ebcdic("T1V10500", 8))  # Code page (example)
-        data.extend(triplet)
+        parts.append(bytes([
+            0x16,  # Triplet length (22 bytes)
+            0x8D,  # MCF-1 triplet ID
+            local_id,  # Local font ID
+            0x00,  # Section ID
+        ]))
+        parts.append(_to_ebcdic(font_name, 8))  # Coded font name
+        parts.append(_MCF_CODE_PAGE)  # Code page (example)
 
-    return _sf(SF_MCF, bytes(data))
+    return _sf(SF_MCF, b''.join(parts))
 
 
 def _build_ips(segment_name: str) -> bytes:
@@ -319,8 +455,15 @@ def _build_ips(segment_name: str) -> bytes:
 
     References a page segment by name.
     """
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(segment_name, 8)
-    return _sf(SF_IPS, data)
+    return _build_named_sf(SF_IPS, _to_ebcdic(segment_name, 8))
+
+
+# Fields without variable content are built once and reused for every page
+_BAG_SF = _sf(SF_BAG, _SF_FLAGS)
+_EAG_SF = _sf(SF_EAG, _SF_FLAGS)
+_EIO_SF = _sf(SF_EIO, _SF_FLAGS)
+_BOG_SF = _sf(SF_BOG, _SF_FLAGS)
+_EOG_SF = _sf(SF_EOG, _SF_FLAGS)
 
 
 def _build_bag() -> bytes:
@@ -329,53 +472,53 @@ def _build_bag() -> bytes:
 
     The AEG contains resource mappings and environment settings for the page.
     """
-    data = bytes([0x00, 0x00, 0x00])
-    return _sf(SF_BAG, data)
+    return _BAG_SF
 
 
 def _build_eag() -> bytes:
     """
     Build End Active Environment Group (EAG) structured field.
     """
-    data = bytes([0x00, 0x00, 0x00])
-    return _sf(SF_EAG, data)
+    return _EAG_SF
 
 
 # ============== Image/Page Segment Building Functions ==============
 
 def _build_bps(name: str) -> bytes:
     """Begin Page Segment."""
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(name, 8)
-    return _sf(SF_BPS, data)
+    return _build_named_sf(SF_BPS, _to_ebcdic(name, 8))
 
 
 def _build_eps(name: str) -> bytes:
     """End Page Segment."""
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(name, 8)
-    return _sf(SF_EPS, data)
+    return _build_named_sf(SF_EPS, _to_ebcdic(name, 8))
 
 
 def _build_bio(name: str) -> bytes:
     """Begin Image Object."""
-    data = bytes([0x00, 0x00, 0x00]) + _to_ebcdic(name, 8)
-    return _sf(SF_BIO, data)
+    return _build_named_sf(SF_BIO, _to_ebcdic(name, 8))
+
+
+# Inline images use an unnamed (blank) BIO
+_BIO_UNNAMED_SF = _build_bio("")
 
 
 def _build_eio() -> bytes:
     """End Image Object."""
-    return _sf(SF_EIO, bytes([0x00, 0x00, 0x00]))
+    return _EIO_SF
 
 
 def _build_bog() -> bytes:
     """Begin Object Environment Group."""
-    return _sf(SF_BOG, bytes([0x00, 0x00, 0x00]))
+    return _BOG_SF
 
 
 def _build_eog() -> bytes:
     """End Object Environment Group."""
-    return _sf(SF_EOG, bytes([0x00, 0x00, 0x00]))
+    return _EOG_SF
 
 
+@lru_cache(maxsize=32)
 def _build_obd(width: int, height: int, resolution: int = 240) -> bytes:
     """Object Area Descriptor (OBD) - Elixir compatible."""
     data = bytearray()
@@ -399,17 +542,20 @@ def _build_obp() -> bytes:
     return _sf(SF_OBP, bytes(data))
 
 
+_OBP_SF = _build_obp()
+
+
+# IDD data: flags/unit base, X/Y resolution, width, height, then the
+# IOCA function set triplet (F6)
+_IDD_RECORD = struct.Struct('>4x4H6s')
+_IDD_FUNCTION_SET = bytes([0xF6, 0x04, 0x00, 0x00, 0x00, 0x08])
+
+
+@lru_cache(maxsize=32)
 def _build_idd(width: int, height: int, resolution: int = 240) -> bytes:
     """Image Data Descriptor (IDD) - IOCA format."""
-    data = bytearray()
-    data.extend([0x00, 0x00, 0x00, 0x00])
     res_10 = resolution * 10
-    data.extend(struct.pack('>H', res_10))
-    data.extend(struct.pack('>H', res_10))
-    data.extend(struct.pack('>H', width))
-    data.extend(struct.pack('>H', height))
-    data.extend([0xF6, 0x04, 0x00, 0x00, 0x00, 0x08])
-    return _sf(SF_IDD, bytes(data))
+    return _sf(SF_IDD, _IDD_RECORD.pack(res_10, res_10, width, height, _IDD_FUNCTION_SET))
 
 
 def _build_iid() -> bytes:
@@ -425,123 +571,163 @@ def _build_iid() -> bytes:
     return _sf(SF_IID, bytes(data))
 
 
-def _build_ipd_records(image_data: bytes, width: int, height: int, resolution: int = 240) -> bytes:
-    """Build Image Picture Data (IPD) records with IOCA self-defining fields."""
-    result = bytearray()
+_IID_SF = _build_iid()
 
-    # First IPD - headers
-    first_ipd = bytearray()
-    first_ipd.extend([0x00, 0x00, 0x00])
-    first_ipd.extend([0x70, 0x00])
-    first_ipd.extend([0x91, 0x01, 0xff])
 
-    res_10 = resolution * 10
-    first_ipd.extend([0x94, 0x09, 0x00])
-    first_ipd.extend(struct.pack('>H', res_10))
-    first_ipd.extend(struct.pack('>H', res_10))
-    first_ipd.extend(struct.pack('>H', width))
-    first_ipd.extend(struct.pack('>H', height))
+# Data IPD headers: CC, length, SF ID and flags, followed in every data IPD
+# but the first by the FE 92 size of the data it carries
+_DATA_IPD_HEADER = struct.Struct('>BH3s3x')
+_SIZED_DATA_IPD_HEADER = struct.Struct('>BH3s3x2sH')
 
-    first_ipd.extend([0x95, 0x02, 0x03, 0x01])
-    first_ipd.extend([0x96, 0x01, 0x01])
-    first_ipd.extend([0x97, 0x01, 0x00])
-    first_ipd.extend([0xFE, 0x92])
-    first_ipd.extend(struct.pack('>H', min(len(image_data), 0x1FF4)))
+# Image data per IPD record, and the complete header of an interior (neither
+# first nor last) data IPD, which always carries a full chunk
+_IPD_MAX_DATA = 8180
+_IPD_INTERIOR_HEADER = _SIZED_DATA_IPD_HEADER.pack(
+    CC, 5 + 3 + 4 + _IPD_MAX_DATA, SF_IPD, b'\xFE\x92', _IPD_MAX_DATA
+)
 
-    result.extend(_sf(SF_IPD, bytes(first_ipd)))
+# The first IPD (image segment headers) is the complete SF below: everything up
+# to the IOCA image size parameter (94), resolution and size, the remaining
+# fixed parameters and the FE 92 size of the image data that follows (the SF
+# length excludes the CC byte)
+_FIRST_IPD_RECORD = struct.Struct('>17s4H12sH')
+_FIRST_IPD_HEAD = (
+    bytes([CC]) + _U16.pack(_FIRST_IPD_RECORD.size - 1) + SF_IPD
+    + bytes([0x00, 0x00, 0x00, 0x70, 0x00, 0x91, 0x01, 0xFF, 0x94, 0x09, 0x00])
+)
+_FIRST_IPD_PARAMS = bytes([
+    0x95, 0x02, 0x03, 0x01,
+    0x96, 0x01, 0x01,
+    0x97, 0x01, 0x00,
+    0xFE, 0x92,
+])
 
-    # Data IPDs
-    max_data_per_ipd = 8180
-    offset = 0
-    total = len(image_data)
-    ipd_num = 1
-
-    while offset < total:
-        chunk = bytearray()
-        chunk.extend([0x00, 0x00, 0x00])
-
-        remaining = total - offset
-        chunk_size = min(max_data_per_ipd, remaining)
-        ipd_num += 1
-
-        is_last = (offset + chunk_size >= total)
-        is_first_data_ipd = (ipd_num == 2)
-
-        if is_first_data_ipd and is_last:
-            chunk.extend(image_data[offset:offset + chunk_size])
-            chunk.extend([0x93, 0x00, 0x71, 0x00])
-        elif is_first_data_ipd:
-            chunk.extend(image_data[offset:offset + chunk_size])
-        elif is_last:
-            chunk.extend([0xFE, 0x92])
-            chunk.extend(struct.pack('>H', chunk_size))
-            chunk.extend(image_data[offset:offset + chunk_size])
-            chunk.extend([0x93, 0x00, 0x71, 0x00])
-        else:
-            chunk.extend([0xFE, 0x92])
-            chunk.extend(struct.pack('>H', chunk_size))
-            chunk.extend(image_data[offset:offset + chunk_size])
-
-        result.extend(_sf(SF_IPD, bytes(chunk)))
-        offset += chunk_size
+# Trailer closing the image data in the last IPD
+_IPD_END = bytes([0x93, 0x00, 0x71, 0x00])
 
-    return bytes(result)
 
+def _build_ipd_records(image_data: bytes, width: int, height: int, resolution: int = 240) -> bytes:
+    """Build Image Picture Data (IPD) records with IOCA self-defining fields."""
+    result = bytearray()
+    _append_ipd_records(result, image_data, width, height, resolution)
+    return bytes(result)
 
-def _to_bilevel(gray: bytes, w: int, h: int) -> bytes:
-    """Convert grayscale to 1-bit bilevel (WhiteIsZero)."""
-    bpr = (w + 7) // 8
-    out = bytearray(bpr * h)
 
-    for y in range(h):
-        for x in range(w):
-            idx = y * w + x
-            if idx < len(gray):
-                if gray[idx] < 128:
-                    out[y * bpr + x // 8] |= (0x80 >> (x % 8))
+def _append_ipd_records(out: bytearray, image_data: bytes, width: int, height: int,
+                        resolution: int = 240) -> None:
+    """Append the IPD records built by _build_ipd_records to out."""
+    # First IPD - headers
+    res_10 = resolution * 10
+    out += _FIRST_IPD_RECORD.pack(
+        _FIRST_IPD_HEAD, res_10, res_10, width, height,
+        _FIRST_IPD_PARAMS, min(len(image_data), 0x1FF4),
+    )
 
-    return bytes(out)
+    # Data IPDs
+    max_data_per_ipd = _IPD_MAX_DATA
+    total = len(image_data)
+    num_chunks = (total + max_data_per_ipd - 1) // max_data_per_ipd
+    if num_chunks == 0:
+        return
+
+    # out is grown once by the exact size of all data records, which are then
+    # written in place: each data IPD has a 9-byte prefix (CC, length, SF ID,
+    # flags), every one after the first repeats the FE 92 size header, and the
+    # last ends with the 93 00 71 00 trailer.
+    pos = len(out)
+    out += bytes(9 * num_chunks + 4 * (num_chunks - 1) + total + 4)
+
+    # Slicing the view copies nothing; payload bytes move once, into out
+    image_view = memoryview(image_data)
+
+    # First data IPD: no FE 92 header, ends the image only if it is the sole one
+    first_size = min(max_data_per_ipd, total)
+    is_last = (num_chunks == 1)
+    _DATA_IPD_HEADER.pack_into(out, pos, CC, 5 + 3 + first_size + (4 if is_last else 0), SF_IPD)
+    pos += _DATA_IPD_HEADER.size
+    out[pos:pos + first_size] = image_view[:first_size]
+    pos += first_size
+    if is_last:
+        out[pos:pos + 4] = _IPD_END
+        return
+
+    # Interior data IPDs are always full size, so their header is fixed
+    last_offset = (num_chunks - 1) * max_data_per_ipd
+    for offset in range(max_data_per_ipd, last_offset, max_data_per_ipd):
+        out[pos:pos + len(_IPD_INTERIOR_HEADER)] = _IPD_INTERIOR_HEADER
+        pos += len(_IPD_INTERIOR_HEADER)
+        out[pos:pos + max_data_per_ipd] = image_view[offset:offset + max_data_per_ipd]
+        pos += max_data_per_ipd
+
+    # Last data IPD: FE 92 size header, remaining data and the end trailer
+    last_size = total - last_offset
+    _SIZED_DATA_IPD_HEADER.pack_into(
+        out, pos, CC, 5 + 3 + 4 + last_size + 4, SF_IPD, b'\xFE\x92', last_size
+    )
+    pos += _SIZED_DATA_IPD_HEADER.size
+    out[pos:pos + last_size] = image_view[last_offset:]
+    pos += last_size
+    out[pos:pos + 4] = _IPD_END
 
 
 def generate_inline_image(
     image_data: bytes,
     width: int,
     height: int,
-    resolution: int = 240
+    resolution: int = 240,
+    *,
+    pixel_format: str = 'gray8'
 ) -> bytes:
     """
     Generate an inline image object (without page segment wrapper).
 
     This embeds the image directly in the page using BIO...EIO structure,
     avoiding BPS/EPS/IPS which Bluecrest interprets as page segment references.
-    """
-    # Ensure width is byte-aligned
-    padded_width = ((width + 7) // 8) * 8
-    if padded_width != width:
-        padded_data = bytearray(padded_width * height)
-        for y in range(height):
-            for x in range(width):
-                if y * width + x < len(image_data):
-                    padded_data[y * padded_width + x] = image_data[y * width + x]
-        image_data = bytes(padded_data)
-        width = padded_width
-
-    bilevel_data = _to_bilevel(image_data, width, height)
 
+    pixel_format is 'gray8' (one byte per pixel, thresholded here) or
+    'bilevel' (already 1-bit WhiteIsZero, rows padded to whole bytes), which
+    is used as is.
+
+    image_data may be bytes or any C-contiguous buffer (bytearray, memoryview,
+    a uint8 numpy array of shape (height, width)); it is read in place, so
+    callers need not copy it to bytes first.
+    """
     result = bytearray()
+    _append_inline_image(result, image_data, width, height, resolution, pixel_format)
+    return bytes(result)
+
+
+def _append_inline_image(out: bytearray, image_data: bytes, width: int, height: int,
+                         resolution: int = 240, pixel_format: str = 'gray8') -> None:
+    """Append the image object built by generate_inline_image to out."""
+    # Flat byte view of whatever buffer was passed (e.g. a 2-D array)
+    image_data = memoryview(image_data).cast('B')
+
+    if pixel_format == 'bilevel':
+        bytes_per_row = (width + 7) // 8
+        if len(image_data) != bytes_per_row * height:
+            raise ValueError(
+                f"bilevel image data is {len(image_data)} bytes, "
+                f"expected {bytes_per_row * height} for {width}x{height}"
+            )
+        bilevel_data, width = image_data, bytes_per_row * 8
+    elif pixel_format == 'gray8':
+        # Ensure width is byte-aligned
+        bilevel_data, width = image_to_bilevel(image_data, width, height)
+    else:
+        raise ValueError(f"Unsupported pixel_format: {pixel_format!r}")
+
     # Image object without page segment wrapper
     # Use empty name to avoid any segment reference issues
-    result.extend(_build_bio(""))
-    result.extend(_build_bog())
-    result.extend(_build_obd(width, height, resolution))
-    result.extend(_build_obp())
-    result.extend(_build_iid())
-    result.extend(_build_idd(width, height, resolution))
-    result.extend(_build_eog())
-    result.extend(_build_ipd_records(bilevel_data, width, height, resolution))
-    result.extend(_build_eio())
-
-    return bytes(result)
+    out += _BIO_UNNAMED_SF
+    out += _BOG_SF
+    out.extend(_build_obd(width, height, resolution))
+    out += _OBP_SF
+    out += _IID_SF
+    out.extend(_build_idd(width, height, resolution))
+    out += _EOG_SF
+    _append_ipd_records(out, bilevel_data, width, height, resolution)
+    out += _EIO_SF
 
 
 def generate_inline_page_segment(
@@ -557,44 +743,35 @@ def generate_inline_page_segment(
     This creates BPS...EPS structure that can be embedded in a page.
     NOTE: This may cause issues with Bluecrest - use generate_inline_image instead.
     """
-    segment_name = segment_name.upper()[:8]
+    segment_name = _to_ebcdic(segment_name, 8)
 
     # Ensure width is byte-aligned
-    padded_width = ((width + 7) // 8) * 8
-    if padded_width != width:
-        padded_data = bytearray(padded_width * height)
-        for y in range(height):
-            for x in range(width):
-                if y * width + x < len(image_data):
-                    padded_data[y * padded_width + x] = image_data[y * width + x]
-        image_data = bytes(padded_data)
-        width = padded_width
-
-    bilevel_data = _to_bilevel(image_data, width, height)
+    bilevel_data, width = image_to_bilevel(image_data, width, height)
 
     result = bytearray()
-    result.extend(_build_bps(segment_name))
-    result.extend(_build_bio(segment_name))
-    result.extend(_build_bog())
+    _append_named_sf(result, SF_BPS, segment_name)
+    _append_named_sf(result, SF_BIO, segment_name)
+    result += _BOG_SF
     result.extend(_build_obd(width, height, resolution))
-    result.extend(_build_obp())
-    result.extend(_build_iid())  # Image Input Descriptor (required by some viewers)
+    result += _OBP_SF
+    result += _IID_SF  # Image Input Descriptor (required by some viewers)
     result.extend(_build_idd(width, height, resolution))
-    result.extend(_build_eog())
-    result.extend(_build_ipd_records(bilevel_data, width, height, resolution))
-    result.extend(_build_eio())
-    result.extend(_build_eps(segment_name))
+    result += _EOG_SF
+    _append_ipd_records(result, bilevel_data, width, height, resolution)
+    result += _EIO_SF
+    _append_named_sf(result, SF_EPS, segment_name)
 
     return bytes(result)
 
 
 def generate_afp_document(
-    pages: List[Dict],
+    pages: Iterable[Dict],
     document_name: str = "PRINTDOC",
     resolution: int = 240,
     page_width: int = 2040,
-    page_height: int = 2640
-) -> bytes:
+    page_height: int = 2640,
+    output: Optional[BinaryIO] = None
+) -> Optional[bytes]:
     """
     Generate a complete AFP document with TLE index data.
 
@@ -603,8 +780,11 @@ def generate_afp_document(
     based on TLE records.
 
     Args:
-        pages: List of page dictionaries, each containing:
+        pages: List (or any iterable, e.g. a generator) of page dictionaries,
+            each containing:
             - image_data: bytes - grayscale image data
+            - pixel_format: str - 'gray8' (default) or 'bilevel' when
+              image_data is already 1-bit (see generate_inline_image)
             - width: int - image width in pixels
             - height: int - image height in pixels
             - tle_data: dict - TLE index fields:
@@ -619,65 +799,80 @@ def generate_afp_document(
         resolution: int - DPI (default 240)
         page_width: int - page width in L-units (default 8.5" at 240 DPI)
         page_height: int - page height in L-units (default 11" at 240 DPI)
+        output: optional binary stream; when given, each page is written to it
+            as soon as it is built instead of holding the whole document in memory
 
     Returns:
-        bytes - Complete AFP document
+        bytes - Complete AFP document, or None when written to output
     """
     result = bytearray()
 
     # Generate each page as a separate document (BDT/EDT wrapper)
     # This allows Enrichment One to detect document boundaries via TLE records
     for page_num, page in enumerate(pages, start=1):
-        doc_name = f"DOC{page_num:05d}"
-        page_name = f"P{page_num:07d}"
+        _append_page(result, page_num, page, resolution, page_width, page_height)
+        if output is not None:
+            output.write(result)
+            result.clear()
 
-        # Begin Document - each letter is its own document
-        result.extend(_build_bdt(doc_name))
+    if output is not None:
+        return None
+    return bytes(result)
 
-        # Begin Page
-        result.extend(_build_bpg(page_name))
 
-        # Begin Active Environment Group
-        result.extend(_build_bag())
+def _append_page(
+    out: bytearray,
+    page_num: int,
+    page: Dict,
+    resolution: int,
+    page_width: int,
+    page_height: int
+) -> None:
+    """
+    Append one page of generate_afp_document, wrapped in its own BDT/EDT, to out.
+
+    Pages share no state, so each can be built independently of the others.
+    """
+    # Each name is used by both the begin and end field, so encode it once
+    doc_name = _to_ebcdic(f"DOC{page_num:05d}")
+    page_name = _to_ebcdic(f"P{page_num:07d}")
 
-        # End Active Environment Group
-        result.extend(_build_eag())
+    # Begin Document - each letter is its own document
+    _append_named_sf(out, SF_BDT, doc_name)
 
-        # TLE records for this page (critical for document detection)
-        # Enrichment One uses these to identify document boundaries
-        tle_data = page.get('tle_data', {})
+    # Begin Page
+    _append_named_sf(out, SF_BPG, page_name)
 
-        tle_fields = [
-            ('mailing_name', tle_data.get('mailing_name', '')),
-            ('mailing_addr1', tle_data.get('mailing_addr1', '')),
-            ('mailing_addr2', tle_data.get('mailing_addr2', '')),
-            ('mailing_addr3', tle_data.get('mailing_addr3', '')),
-            ('return_addr1', tle_data.get('return_addr1', '')),
-            ('return_addr2', tle_data.get('return_addr2', '')),
-            ('return_addr3', tle_data.get('return_addr3', '')),
-        ]
+    # Begin Active Environment Group
+    out += _BAG_SF
 
-        for field_name, field_value in tle_fields:
-            # Always write TLE records, even when value is empty
-            result.extend(_build_tle(field_name, field_value))
+    # End Active Environment Group
+    out += _EAG_SF
 
-        # Embed letter image if provided
-        # Uses IM Image format (BIO/EIO) compatible with Bluecrest
-        image_data = page.get('image_data')
-        if image_data:
-            img_width = page.get('width', page_width)
-            img_height = page.get('height', page_height)
-            result.extend(generate_inline_image(
-                image_data, img_width, img_height, resolution
-            ))
+    # TLE records for this page (critical for document detection)
+    # Enrichment One uses these to identify document boundaries
+    tle_data = page.get('tle_data', {})
 
-        # End Page
-        result.extend(_build_epg(page_name))
+    # Always write TLE records, even when value is empty
+    _append_page_tles(out, tle_data)
 
-        # End Document - closes this letter's document boundary
-        result.extend(_build_edt(doc_name))
+    # Embed letter image if provided
+    # Uses IM Image format (BIO/EIO) compatible with Bluecrest
+    image_data = page.get('image_data')
+    # Not plain truthiness: image_data may be an array, which has none
+    if image_data is not None and len(image_data):
+        img_width = page.get('width', page_width)
+        img_height = page.get('height', page_height)
+        _append_inline_image(
+            out, image_data, img_width, img_height, resolution,
+            page.get('pixel_format', 'gray8'),
+        )
 
-    return bytes(result)
+    # End Page
+    _append_named_sf(out, SF_EPG, page_name)
+
+    # End Document - closes this letter's document boundary
+    _append_named_sf(out, SF_EDT, doc_name)
 
 
 # Convenience function for simple usage
@@ -720,8 +915,9 @@ def generate_afp_with_resources(
     document_name: str = "PRINTDOC",
     resolution: int = 240,
     page_width: int = 2040,
-    page_height: int = 2640
-) -> bytes:
+    page_height: int = 2640,
+    output: Optional[BinaryIO] = None
+) -> Optional[bytes]:
     """
     Generate AFP document with Exstream-compatible resource structure.
 
@@ -739,14 +935,17 @@ def generate_afp_with_resources(
         resolution: int - DPI (default 240)
         page_width: int - page width in L-units
         page_height: int - page height in L-units
+        output: optional binary stream; when given, each resource and page
+            group is written to it as soon as it is built
 
     Returns:
-        bytes - Complete AFP document with resource structure
+        bytes - Complete AFP document with resource structure, or None when
+        written to output
     """
     result = bytearray()
 
     # Add document header comments (like Exstream does)
-    result.extend(_build_nop_comment(f"Generated by AdhocPrintStudio"))
+    result += _NOP_GENERATED_BY
     result.extend(_build_nop_comment(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"))
 
     # Begin main document
@@ -761,90 +960,93 @@ def generate_afp_with_resources(
         if not image_data:
             continue
 
-        segment_name = f"S{page_num:07d}"
+        # The segment name appears in four fields here and in the page's IPS
+        segment_name = _to_ebcdic(f"S{page_num:07d}")
         page_segments.append((page_num, segment_name))
 
         img_width = page.get('width', page_width)
         img_height = page.get('height', page_height)
 
         # Begin Resource (Page Segment type = 0x03)
-        result.extend(_build_brs(segment_name, resource_type=0x03))
+        _append_brs(result, segment_name, resource_type=0x03)
 
         # Begin Page Segment
-        result.extend(_build_bps(segment_name))
+        _append_named_sf(result, SF_BPS, segment_name)
 
         # Image Object within Page Segment
-        image_obj_name = f"I{page_num:07d}"
-        result.extend(_build_bio(image_obj_name))
+        _append_named_sf(result, SF_BIO, _to_ebcdic(f"I{page_num:07d}"))
 
         # Object Environment Group
-        result.extend(_build_bog())
+        result += _BOG_SF
         result.extend(_build_obd(img_width, img_height, resolution))
-        result.extend(_build_obp())
-        result.extend(_build_iid())
-        result.extend(_build_eog())
+        result += _OBP_SF
+        result += _IID_SF
+        result += _EOG_SF
 
         # Image Data
         result.extend(_build_idd(img_width, img_height, resolution))
-        result.extend(_build_ipd_records(image_data, img_width, img_height, resolution))
+        _append_ipd_records(result, image_data, img_width, img_height, resolution)
 
         # End Image Object
-        result.extend(_build_eio())
+        result += _EIO_SF
 
         # End Page Segment
-        result.extend(_build_eps(segment_name))
+        _append_named_sf(result, SF_EPS, segment_name)
 
         # End Resource
-        result.extend(_build_ers(segment_name))
+        _append_named_sf(result, SF_ERS, segment_name)
+
+        if output is not None:
+            output.write(result)
+            result.clear()
 
     # ============== PAGE SECTION ==============
     # Now output pages that reference the page segment resources
 
+    # Every page maps the same default font, so the MCF is built once
+    mcf = _build_mcf()
+
     segment_index = 0
     for page_num, page in enumerate(pages, start=1):
-        group_name = f"G{page_num:07d}"
-        page_name = f"P{page_num:07d}"
+        group_name = _to_ebcdic(f"G{page_num:07d}")
+        page_name = _to_ebcdic(f"P{page_num:07d}")
 
         # Begin Named Page Group (for document boundary detection)
-        result.extend(_build_bng(group_name))
+        _append_named_sf(result, SF_BNG, group_name)
 
         # TLE records for this page/group (critical for indexing)
         tle_data = page.get('tle_data', {})
-        tle_fields = [
-            ('mailing_name', tle_data.get('mailing_name', '')),
-            ('mailing_addr1', tle_data.get('mailing_addr1', '')),
-            ('mailing_addr2', tle_data.get('mailing_addr2', '')),
-            ('mailing_addr3', tle_data.get('mailing_addr3', '')),
-            ('return_addr1', tle_data.get('return_addr1', '')),
-            ('return_addr2', tle_data.get('return_addr2', '')),
-            ('return_addr3', tle_data.get('return_addr3', '')),
-        ]
-
-        for field_name, field_value in tle_fields:
-            result.extend(_build_tle(field_name, field_value))
+        _append_page_tles(result, tle_data)
 
         # Begin Page
-        result.extend(_build_bpg(page_name))
+        _append_named_sf(result, SF_BPG, page_name)
 
         # Active Environment Group with font mapping
-        result.extend(_build_bag())
+        result += _BAG_SF
         # Include Map Coded Font for text rendering support
-        result.extend(_build_mcf())
-        result.extend(_build_eag())
+        result.extend(mcf)
+        result += _EAG_SF
 
         # Include Page Segment reference (instead of inline image)
         if page.get('image_data') and segment_index < len(page_segments):
             _, segment_name = page_segments[segment_index]
-            result.extend(_build_ips(segment_name))
+            _append_named_sf(result, SF_IPS, segment_name)
             segment_index += 1
 
         # End Page
-        result.extend(_build_epg(page_name))
+        _append_named_sf(result, SF_EPG, page_name)
 
         # End Named Page Group
-        result.extend(_build_eng(group_name))
+        _append_named_sf(result, SF_ENG, group_name)
+
+        if output is not None:
+            output.write(result)
+            result.clear()
 
     # End Document
     result.extend(_build_edt(document_name))
 
+    if output is not None:
+        output.write(result)
+        return None
     return bytes(result)
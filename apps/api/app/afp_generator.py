@@ -7,12 +7,22 @@ Compatible with SCRIPT/VS, DCF, and 3820.
 
 import struct
 import io
+from datetime import datetime
+from functools import lru_cache
+
 from PIL import Image
 
+# WhiteIsZero conversion shared with the document generator
+from app.bilevel import image_to_bilevel, to_bilevel
+
 # Line ending between structured fields (as used by Elixir)
 CRLF = b'\x0d\x0a'
 CC = 0x5A
 
+# SF prefix (CC + 2-byte length) and other big-endian 2-byte fields, compiled once
+_SF_HEADER = struct.Struct('>BH')
+_U16 = struct.Struct('>H')
+
 # Structured Field Identifiers (IOCA format - category FB)
 SF_BPS = bytes([0xD3, 0xA8, 0x5F])  # Begin Page Segment
 SF_EPS = bytes([0xD3, 0xA9, 0x5F])  # End Page Segment
@@ -33,133 +43,168 @@ SF_NOP = bytes([0xD3, 0xEE, 0xEE])  # No Operation
 
 def _sf(sf_id: bytes, data: bytes = b'') -> bytes:
     """Build structured field with CRLF suffix."""
-    length = 5 + len(data)
-    return bytes([CC]) + struct.pack('>H', length) + sf_id + data + CRLF
+    return b''.join((_SF_HEADER.pack(CC, 5 + len(data)), sf_id, data, CRLF))
+
+
+def _sf_append(out: bytearray, sf_id: bytes, *parts: bytes) -> None:
+    """Append the structured field _sf builds for the joined parts to out, without joining them."""
+    out += _SF_HEADER.pack(CC, 5 + sum(map(len, parts)))
+    out += sf_id
+    for part in parts:
+        out += part
+    out += CRLF
+
+
+@lru_cache(maxsize=32)
+def _named_sf_data(name: str) -> bytes:
+    """
+    3 flag bytes + 8-char EBCDIC name, the data of BPS, EPS and BIO.
+
+    A page segment uses the same name in all three, so it is encoded once.
+    """
+    ebcdic_name = name.upper()[:8].ljust(8).encode('cp500')
+    return bytes([0x00, 0x00, 0x00]) + ebcdic_name
 
 
 def _build_bps(name: str) -> bytes:
     """Begin Page Segment: 3 flag bytes + 8-char EBCDIC name."""
-    ebcdic_name = name.upper()[:8].ljust(8).encode('cp500')
-    data = bytes([0x00, 0x00, 0x00]) + ebcdic_name
-    return _sf(SF_BPS, data)
+    return _sf(SF_BPS, _named_sf_data(name))
 
 
-def _build_nop_records(name: str) -> bytes:
+_NOP_COMMENT_LENGTH = 86
+
+
+@lru_cache(maxsize=32)
+def _nop_prefixes(name: str) -> tuple:
     """
-    Build NOP (No Operation) records with metadata.
+    Flags + comment text before the timestamp, encoded for both NOPs.
+
+    Returns (ebcdic_prefix, ascii_prefix, prefix_length); only the timestamp
+    varies between calls for the same name.
     """
-    from datetime import datetime
+    # Build comment text with custom copyright
+    prefix = f"{name.upper()[:8].ljust(8)} (c)2025 Copyright by Elevance Health "
+    flags = bytes([0x00, 0x00, 0x00])
+    return flags + prefix.encode('cp500'), flags + prefix.encode('ascii'), len(prefix)
 
-    result = bytearray()
 
-    # Get current timestamp
-    now = datetime.now()
-    timestamp = now.strftime("%m/%d/%Y   %I:%M:%S %p")
+def _nop_timestamp(now: datetime) -> str:
+    """Format now as strftime("%m/%d/%Y   %I:%M:%S %p") does, without the locale lookups."""
+    return '%02d/%02d/%04d   %02d:%02d:%02d %s' % (
+        now.month, now.day, now.year,
+        now.hour % 12 or 12, now.minute, now.second,
+        'PM' if now.hour >= 12 else 'AM',
+    )
 
-    # Build comment text with custom copyright
-    comment = f"{name.upper()[:8].ljust(8)} (c)2025 Copyright by Elevance Health {timestamp}"
 
-    # Pad to fixed length (86 chars)
-    comment = comment[:86].ljust(86)
+def _build_nop_records(name: str) -> bytes:
+    """
+    Build NOP (No Operation) records with metadata.
+    """
+    ebcdic_prefix, ascii_prefix, prefix_length = _nop_prefixes(name)
+
+    # Get current timestamp, padding the comment to fixed length (86 chars)
+    tail_length = _NOP_COMMENT_LENGTH - prefix_length
+    tail = _nop_timestamp(datetime.now())[:tail_length].ljust(tail_length)
+
+    result = bytearray()
 
     # First NOP: EBCDIC encoded
-    ebcdic_comment = comment.encode('cp500')
-    data1 = bytes([0x00, 0x00, 0x00]) + ebcdic_comment
-    result.extend(_sf(SF_NOP, data1))
+    _sf_append(result, SF_NOP, ebcdic_prefix, tail.encode('cp500'))
 
     # Second NOP: ASCII encoded
-    ascii_comment = comment.encode('ascii')
-    data2 = bytes([0x00, 0x00, 0x00]) + ascii_comment
-    result.extend(_sf(SF_NOP, data2))
+    _sf_append(result, SF_NOP, ascii_prefix, tail.encode('ascii'))
 
     return bytes(result)
 
 
 def _build_eps(name: str) -> bytes:
     """End Page Segment: 3 flag bytes + 8-char EBCDIC name (matching Elixir format)."""
-    ebcdic_name = name.upper()[:8].ljust(8).encode('cp500')
-    data = bytes([0x00, 0x00, 0x00]) + ebcdic_name
-    return _sf(SF_EPS, data)
+    return _sf(SF_EPS, _named_sf_data(name))
 
 
 def _build_bio(name: str) -> bytes:
     """Begin Image Object: 3 flag bytes + 8-char EBCDIC name."""
-    ebcdic_name = name.upper()[:8].ljust(8).encode('cp500')
-    data = bytes([0x00, 0x00, 0x00]) + ebcdic_name
-    return _sf(SF_BIO, data)
+    return _sf(SF_BIO, _named_sf_data(name))
+
+
+# Structured fields that carry only 3 flag bytes never change
+_EIO_SF = _sf(SF_EIO, bytes([0x00, 0x00, 0x00]))
+_BOG_SF = _sf(SF_BOG, bytes([0x00, 0x00, 0x00]))
+_EOG_SF = _sf(SF_EOG, bytes([0x00, 0x00, 0x00]))
 
 
 def _build_eio() -> bytes:
     """End Image Object (with 3 flag bytes)."""
-    return _sf(SF_EIO, bytes([0x00, 0x00, 0x00]))
+    return _EIO_SF
 
 
 def _build_bog() -> bytes:
     """Begin Object Environment Group (with 3 flag bytes)."""
-    return _sf(SF_BOG, bytes([0x00, 0x00, 0x00]))
+    return _BOG_SF
 
 
 def _build_eog() -> bytes:
     """End Object Environment Group (with 3 flag bytes)."""
-    return _sf(SF_EOG, bytes([0x00, 0x00, 0x00]))
+    return _EOG_SF
 
 
-def _build_obd(width: int, height: int, resolution: int = 240) -> bytes:
-    """
-    Object Area Descriptor (OBD).
-
-    Contains triplets describing the object area.
-    Matches Elixir DesignPro format.
-    """
-    data = bytearray()
-
+# OBD data (Elixir DesignPro values); the same for every image
+_OBD_DATA = b''.join((
     # Reserved flags (3 bytes)
-    data.extend([0x00, 0x00, 0x00])
-
+    bytes([0x00, 0x00, 0x00]),
     # Triplet 1: 0x43 - Descriptor Position (3 bytes)
-    data.extend([0x03, 0x43, 0x01])
-
+    bytes([0x03, 0x43, 0x01]),
     # Triplet 2: 0x4B - Mapping Option (8 bytes)
     # Use 14400 L-units per 10 inches (1440 DPI reference)
-    data.extend([0x08, 0x4B, 0x00, 0x00])
-    data.extend([0x38, 0x40])  # 14400 X L-units
-    data.extend([0x38, 0x40])  # 14400 Y L-units
-
+    bytes([0x08, 0x4B, 0x00, 0x00, 0x38, 0x40, 0x38, 0x40]),  # 14400 X / Y L-units
     # Triplet 3: 0x4C - Object Classification (9 bytes)
     # Using Elixir DesignPro values: 23 4E 00 21 95
-    data.extend([0x09, 0x4C, 0x02, 0x00, 0x23, 0x4E, 0x00, 0x21, 0x95])
+    bytes([0x09, 0x4C, 0x02, 0x00, 0x23, 0x4E, 0x00, 0x21, 0x95]),
+))
 
-    return _sf(SF_OBD, bytes(data))
 
-
-def _build_obp(x_offset: int = 0, y_offset: int = 0, resolution: int = 240) -> bytes:
+def _build_obd(width: int, height: int, resolution: int = 240) -> bytes:
     """
-    Object Area Position (OBP).
+    Object Area Descriptor (OBD).
 
-    Defines the position of the object within the page.
+    Contains triplets describing the object area.
     Matches Elixir DesignPro format.
     """
-    data = bytearray()
+    return _sf(SF_OBD, _OBD_DATA)
 
-    # Reserved flags (3 bytes)
-    data.extend([0x00, 0x00, 0x00])
 
+# OBP data (Elixir DesignPro values); default positioning for every image
+_OBP_DATA = b''.join((
+    # Reserved flags (3 bytes)
+    bytes([0x00, 0x00, 0x00]),
     # OEP Repeating Group (Object Environment Position)
     # Format from Elixir: 01 17 + 21 bytes of position data
-    data.append(0x01)  # RG identifier
-    data.append(0x17)  # Length of following data (23 bytes)
-
+    bytes([0x01, 0x17]),  # RG identifier, length of following data (23 bytes)
     # Position data (all zeros for default positioning)
-    data.extend([0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])  # 8 bytes
-
+    bytes(8),
     # Offset values (0x2d = 45 at specific positions, matching Elixir)
-    data.extend([0x2d, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00])  # 8 bytes
-    data.extend([0x00, 0x00, 0x00])  # 3 bytes
-
+    bytes([0x2d, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00]),
+    bytes(3),
     # Final offset
-    data.extend([0x2d, 0x00, 0x00])  # 3 bytes
+    bytes([0x2d, 0x00, 0x00]),
+))
+
+
+def _build_obp(x_offset: int = 0, y_offset: int = 0, resolution: int = 240) -> bytes:
+    """
+    Object Area Position (OBP).
+
+    Defines the position of the object within the page.
+    Matches Elixir DesignPro format.
+    """
+    return _sf(SF_OBP, _OBP_DATA)
 
-    return _sf(SF_OBP, bytes(data))
+
+# IDD data: 4 reserved bytes, X/Y resolution units per 10 inches, width and
+# height in pels, then flags/parameters (matching Elixir: f6 04 00 00 00 08)
+_IDD_DATA = struct.Struct('>4x4H6s')
+_IDD_PARAMS = bytes([0xF6, 0x04, 0x00, 0x00, 0x00, 0x08])
 
 
 def _build_idd(width: int, height: int, resolution: int = 240) -> bytes:
@@ -169,24 +214,49 @@ def _build_idd(width: int, height: int, resolution: int = 240) -> bytes:
     Matches Elixir DesignPro format.
     Format: 4 reserved bytes + resolution (4 bytes) + dimensions (4 bytes) + flags
     """
-    data = bytearray()
-
-    # Reserved bytes (4 bytes, matching Elixir)
-    data.extend([0x00, 0x00, 0x00, 0x00])
-
-    # Resolution units per 10 inches
     res_10 = resolution * 10
-    data.extend(struct.pack('>H', res_10))  # X resolution
-    data.extend(struct.pack('>H', res_10))  # Y resolution
+    return _sf(SF_IDD, _IDD_DATA.pack(res_10, res_10, width, height, _IDD_PARAMS))
+
+
+# First IPD: SF header, flags (3 bytes), IOCA function set identifier
+# (matching Elixir: 70 00), Begin Image Content (0x91) and the Image Size
+# Parameter (0x94) ID, then its resolutions and dimensions, the parameters
+# below, the 2-byte total length indicator following the FE 92 marker and CRLF
+_FIRST_IPD_RECORD = struct.Struct('>17s4H12sH2s')
+_FIRST_IPD_HEAD = (
+    _SF_HEADER.pack(CC, _FIRST_IPD_RECORD.size - 3) + SF_IPD
+    + bytes([0x00, 0x00, 0x00, 0x70, 0x00, 0x91, 0x01, 0xff, 0x94, 0x09, 0x00])
+)
+# Image Encoding Parameter (0x95): compression (0x03 = G4/MMR,
+# 0x00 = uncompressed) and recording algorithm (0x01 for G4), followed by
+# IDE Structure (0x96), Bilevel Image Color (0x97) and the Image Data marker
+# (0xFE 0x92) indicating image data follows in subsequent IPDs
+_FIRST_IPD_PARAMS_G4 = bytes([0x95, 0x02, 0x03, 0x01, 0x96, 0x01, 0x01, 0x97, 0x01, 0x00, 0xFE, 0x92])
+_FIRST_IPD_PARAMS_RAW = bytes([0x95, 0x02, 0x00, 0x03, 0x96, 0x01, 0x01, 0x97, 0x01, 0x00, 0xFE, 0x92])
+
+
+@lru_cache(maxsize=32)
+def _build_oeg(width: int, height: int, resolution: int) -> bytes:
+    """
+    Object Environment Group: BOG, OBD, OBP, IDD and EOG.
 
-    # Image dimensions
-    data.extend(struct.pack('>H', width))   # Width in pels
-    data.extend(struct.pack('>H', height))  # Height in pels
+    Depends only on the image geometry, which repeats across segments of
+    the same page size, so it is built once per size.
+    """
+    return b''.join((
+        _build_bog(),
+        _build_obd(width, height, resolution),
+        _build_obp(0, 0, resolution),
+        _build_idd(width, height, resolution),
+        _build_eog(),
+    ))
 
-    # Additional flags/parameters (matching Elixir: f6 04 00 00 00 08)
-    data.extend([0xF6, 0x04, 0x00, 0x00, 0x00, 0x08])
 
-    return _sf(SF_IDD, bytes(data))
+# Pieces of the data IPDs: flags, the FE 92 marker in front of a chunk's size
+# and End Image Content + End Tile (Elixir format) closing the last one
+_IPD_FLAGS = bytes([0x00, 0x00, 0x00])
+_IPD_DATA_MARKER = bytes([0xFE, 0x92])
+_IPD_END = bytes([0x93, 0x00, 0x71, 0x00])
 
 
 def _build_ipd_records(image_data: bytes, width: int, height: int, resolution: int = 240, use_g4: bool = True) -> bytes:
@@ -200,48 +270,22 @@ def _build_ipd_records(image_data: bytes, width: int, height: int, resolution: i
     - Final IPD: flags + 93 01 ff (End Image Content)
     """
     result = bytearray()
+    _append_ipd_records(result, image_data, width, height, resolution, use_g4)
+    return bytes(result)
 
-    # First IPD contains Begin Image Content and image parameters only
-    first_ipd = bytearray()
-
-    # Flags (3 bytes)
-    first_ipd.extend([0x00, 0x00, 0x00])
-
-    # IOCA function set identifier (matching Elixir: 70 00)
-    first_ipd.extend([0x70, 0x00])
-
-    # Begin Image Content (0x91)
-    first_ipd.extend([0x91, 0x01, 0xff])
 
-    # Image Size Parameter (0x94)
+def _append_ipd_records(out: bytearray, image_data: bytes, width: int, height: int,
+                        resolution: int = 240, use_g4: bool = True) -> None:
+    """Append the IPD records built by _build_ipd_records to out."""
+    # First IPD contains Begin Image Content and image parameters only,
+    # packed with its SF header in one call
     res_10 = resolution * 10
-    first_ipd.extend([0x94, 0x09, 0x00])
-    first_ipd.extend(struct.pack('>H', res_10))
-    first_ipd.extend(struct.pack('>H', res_10))
-    first_ipd.extend(struct.pack('>H', width))
-    first_ipd.extend(struct.pack('>H', height))
-
-    # Image Encoding Parameter (0x95)
-    # Byte 1: Compression (0x03 = G4/MMR, 0x00 = uncompressed)
-    # Byte 2: Recording algorithm (0x01 for G4)
-    if use_g4:
-        first_ipd.extend([0x95, 0x02, 0x03, 0x01])
-    else:
-        first_ipd.extend([0x95, 0x02, 0x00, 0x03])
-
-    # IDE Structure (0x96)
-    first_ipd.extend([0x96, 0x01, 0x01])
-
-    # Bilevel Image Color (0x97)
-    first_ipd.extend([0x97, 0x01, 0x00])
-
-    # Image Data marker (0xFE 0x92) - indicates image data follows in subsequent IPDs
-    # Elixir uses FE 92 followed by 2-byte total length indicator
-    first_ipd.extend([0xFE, 0x92])
-    # Add placeholder length (will be filled by subsequent IPDs)
-    first_ipd.extend(struct.pack('>H', min(len(image_data), 0x1FF4)))
-
-    result.extend(_sf(SF_IPD, bytes(first_ipd)))
+    out += _FIRST_IPD_RECORD.pack(
+        _FIRST_IPD_HEAD, res_10, res_10, width, height,
+        _FIRST_IPD_PARAMS_G4 if use_g4 else _FIRST_IPD_PARAMS_RAW,
+        # Placeholder length (will be filled by subsequent IPDs)
+        min(len(image_data), 0x1FF4), CRLF,
+    )
 
     # Image data IPDs - matching exact Elixir pattern:
     # - IPD #2 (first data IPD): NO FE marker, just raw data
@@ -251,64 +295,65 @@ def _build_ipd_records(image_data: bytes, width: int, height: int, resolution: i
     offset = 0
     total = len(image_data)
     ipd_num = 1  # First IPD was headers
+    # Slices of the view are appended to out without an intermediate copy
+    image_view = memoryview(image_data)
 
     while offset < total:
-        chunk = bytearray()
-        # Add flags for continuation IPDs
-        chunk.extend([0x00, 0x00, 0x00])
-
         remaining = total - offset
         chunk_size = min(max_data_per_ipd, remaining)
         ipd_num += 1
 
         is_last = (offset + chunk_size >= total)
         is_first_data_ipd = (ipd_num == 2)
+        chunk_data = image_view[offset:offset + chunk_size]
 
+        # Each chunk is appended to out as it is produced (flags for
+        # continuation IPDs first) rather than assembled separately
         if is_first_data_ipd and is_last:
             # First and only data IPD: raw data + End Image Content (no FE marker)
-            chunk.extend(image_data[offset:offset + chunk_size])
-            chunk.extend([0x93, 0x00, 0x71, 0x00])  # End Image Content + End Tile (Elixir format)
+            _sf_append(out, SF_IPD, _IPD_FLAGS, chunk_data, _IPD_END)
         elif is_first_data_ipd:
             # First data IPD: NO FE marker, just raw data (matching Elixir IPD #2)
-            chunk.extend(image_data[offset:offset + chunk_size])
+            _sf_append(out, SF_IPD, _IPD_FLAGS, chunk_data)
         elif is_last:
             # Last IPD: FE 92 + length + data + End Image Content
-            chunk.extend([0xFE, 0x92])
-            chunk.extend(struct.pack('>H', chunk_size))
-            chunk.extend(image_data[offset:offset + chunk_size])
-            chunk.extend([0x93, 0x00, 0x71, 0x00])  # End Image Content + End Tile (Elixir format)
+            _sf_append(out, SF_IPD, _IPD_FLAGS, _IPD_DATA_MARKER, _U16.pack(chunk_size), chunk_data, _IPD_END)
         else:
             # Middle IPDs: FE 92 + length + data
-            chunk.extend([0xFE, 0x92])
-            chunk.extend(struct.pack('>H', chunk_size))
-            chunk.extend(image_data[offset:offset + chunk_size])
+            _sf_append(out, SF_IPD, _IPD_FLAGS, _IPD_DATA_MARKER, _U16.pack(chunk_size), chunk_data)
 
-        result.extend(_sf(SF_IPD, bytes(chunk)))
         offset += chunk_size
 
-    return bytes(result)
 
+# TIFF header, IFD entry count, IFD entry (tag, type, count, value) and
+# inline SHORT / LONG value layouts, keyed by the 2-byte byte order mark
+_TIFF_STRUCTS = {
+    order_mark: tuple(struct.Struct(prefix + fmt) for fmt in ('4xI', 'H', 'HHI4s', 'H2x', 'I'))
+    for order_mark, prefix in ((b'II', '<'), (b'MM', '>'))
+}
+_TIFF_SHORT = 3
+_TIFF_STRIP_OFFSETS = 273
+_TIFF_STRIP_BYTE_COUNTS = 279
+
+
+def _tiff_single_strip(tiff_data) -> tuple:
+    """Return (offset, byte count) of the only strip in a TIFF held in memory."""
+    header, entry_count, entry, short_value, long_value = _TIFF_STRUCTS[bytes(tiff_data[0:2])]
+    ifd_offset, = header.unpack_from(tiff_data)
+    num_entries, = entry_count.unpack_from(tiff_data, ifd_offset)
+    value_of = {}
+    for entry_offset in range(ifd_offset + 2, ifd_offset + 2 + num_entries * 12, 12):
+        tag, field_type, _count, value = entry.unpack_from(tiff_data, entry_offset)
+        # For SHORT or LONG values that fit in 4 bytes, value is inline
+        if tag in (_TIFF_STRIP_OFFSETS, _TIFF_STRIP_BYTE_COUNTS):
+            value_struct = short_value if field_type == _TIFF_SHORT else long_value
+            value_of[tag], = value_struct.unpack(value)
+    return value_of[_TIFF_STRIP_OFFSETS], value_of[_TIFF_STRIP_BYTE_COUNTS]
 
-def _to_bilevel(gray: bytes, w: int, h: int) -> bytes:
-    """
-    Convert grayscale to 1-bit bilevel.
-
-    Uses WhiteIsZero convention (IOCA standard):
-    - bit=0 means white (background)
-    - bit=1 means black (foreground/ink)
-    """
-    bpr = (w + 7) // 8
-    out = bytearray(bpr * h)
-
-    for y in range(h):
-        for x in range(w):
-            idx = y * w + x
-            if idx < len(gray):
-                # WhiteIsZero: dark pixels (<128) get bit=1 (black)
-                if gray[idx] < 128:
-                    out[y * bpr + x // 8] |= (0x80 >> (x % 8))
 
-    return bytes(out)
+# Threshold lookup table for _compress_g4, passed to Image.point directly
+# instead of a callable PIL has to evaluate to build the same table
+_G4_THRESHOLD_LUT = [255 if x < 128 else 0 for x in range(256)]
 
 
 def _compress_g4(gray: bytes, w: int, h: int) -> bytes:
@@ -325,66 +370,28 @@ def _compress_g4(gray: bytes, w: int, h: int) -> bytes:
     # PIL saves G4 with BlackIsZero, so we invert to get WhiteIsZero output:
     # - Light pixels (>= 128) → 0 in PIL → 0 bits → white in WhiteIsZero ✓
     # - Dark pixels (< 128) → 255 in PIL → 1 bits → black in WhiteIsZero ✓
-    bilevel = img.point(lambda x: 255 if x < 128 else 0, '1')
+    bilevel = img.point(_G4_THRESHOLD_LUT, '1')
 
     # Save as G4 compressed TIFF to extract compressed data
     # Use a single strip to simplify extraction
     tiff_buffer = io.BytesIO()
     bilevel.save(tiff_buffer, format='TIFF', compression='group4',
                  tiffinfo={278: h})  # RowsPerStrip = full height = single strip
-    tiff_data = tiff_buffer.getvalue()
 
-    # Parse TIFF to extract G4 compressed data
+    # Parse TIFF to extract G4 compressed data, reading the buffer in place
     # TIFF structure: header (8 bytes) + IFD + strip data
     # We need to find StripOffsets and StripByteCounts tags
-
-    # Check byte order
-    byte_order = tiff_data[0:2]
-    if byte_order == b'II':  # Little-endian
-        def read_short(data, offset):
-            return struct.unpack('<H', data[offset:offset+2])[0]
-        def read_long(data, offset):
-            return struct.unpack('<I', data[offset:offset+4])[0]
-    else:  # Big-endian (MM)
-        def read_short(data, offset):
-            return struct.unpack('>H', data[offset:offset+2])[0]
-        def read_long(data, offset):
-            return struct.unpack('>I', data[offset:offset+4])[0]
-
-    # Get IFD offset
-    ifd_offset = read_long(tiff_data, 4)
-
-    # Parse IFD entries
-    num_entries = read_short(tiff_data, ifd_offset)
-
-    strip_offsets = None
-    strip_byte_counts = None
-
-    for i in range(num_entries):
-        entry_offset = ifd_offset + 2 + (i * 12)
-        tag = read_short(tiff_data, entry_offset)
-        field_type = read_short(tiff_data, entry_offset + 2)
-        count = read_long(tiff_data, entry_offset + 4)
-
-        # For SHORT or LONG values that fit in 4 bytes, value is inline
-        if tag == 273:  # StripOffsets
-            if field_type == 3:  # SHORT
-                strip_offsets = read_short(tiff_data, entry_offset + 8)
-            else:  # LONG
-                strip_offsets = read_long(tiff_data, entry_offset + 8)
-        elif tag == 279:  # StripByteCounts
-            if field_type == 3:  # SHORT
-                strip_byte_counts = read_short(tiff_data, entry_offset + 8)
-            else:  # LONG
-                strip_byte_counts = read_long(tiff_data, entry_offset + 8)
-
-    if strip_offsets is not None and strip_byte_counts is not None:
-        # Extract the G4 compressed data
-        g4_data = tiff_data[strip_offsets:strip_offsets + strip_byte_counts]
-        return g4_data
+    with tiff_buffer.getbuffer() as tiff_data:
+        try:
+            strip_offsets, strip_byte_counts = _tiff_single_strip(tiff_data)
+        except (KeyError, struct.error):
+            pass
+        else:
+            # Extract the G4 compressed data
+            return bytes(tiff_data[strip_offsets:strip_offsets + strip_byte_counts])
 
     # Fallback: return uncompressed if extraction fails
-    return _to_bilevel(gray, w, h)
+    return to_bilevel(gray, w, h)
 
 
 def generate_page_segment(
@@ -403,21 +410,12 @@ def generate_page_segment(
         segment_name = "S1" + segment_name
     segment_name = segment_name[:8]
 
-    # Ensure width is byte-aligned
-    padded_width = ((width + 7) // 8) * 8
-    if padded_width != width:
-        padded_data = bytearray(padded_width * height)
-        for y in range(height):
-            for x in range(width):
-                if y * width + x < len(image_data):
-                    padded_data[y * padded_width + x] = image_data[y * width + x]
-        image_data = bytes(padded_data)
-        width = padded_width
-
     # Convert grayscale to raw bilevel (WhiteIsZero: bit=0 is white, bit=1 is black)
+    # with byte-aligned width; padding columns are black, as when the image
+    # was copied into a zero-filled padded buffer, but are added while packing
     # IMPORTANT: Elixir DesignPro declares G4 in header but uses RAW bilevel data!
     # This is confirmed by analyzing S1RET261.seg - file size matches raw bilevel, not compressed
-    bilevel_data = _to_bilevel(image_data, width, height)
+    bilevel_data, width = image_to_bilevel(image_data, width, height)
 
     result = bytearray()
 
@@ -432,16 +430,12 @@ def generate_page_segment(
     result.extend(_build_bio(segment_name))
 
     # 3. Object Environment Group
-    result.extend(_build_bog())
-    result.extend(_build_obd(width, height, x_resolution))
-    result.extend(_build_obp(0, 0, x_resolution))
-    result.extend(_build_idd(width, height, x_resolution))
-    result.extend(_build_eog())
+    result.extend(_build_oeg(width, height, x_resolution))
 
     # 4. Image Picture Data with raw bilevel data
     # NOTE: use_g4=True sets header flag to 0x03,0x01 (matching Elixir)
     # but the DATA is raw bilevel (this is how Elixir works!)
-    result.extend(_build_ipd_records(bilevel_data, width, height, x_resolution, use_g4=True))
+    _append_ipd_records(result, bilevel_data, width, height, x_resolution, use_g4=True)
 
     # 5. End Image Object
     result.extend(_build_eio())
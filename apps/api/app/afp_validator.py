@@ -6,12 +6,19 @@ Validates AFP document structure according to IBM AFP specifications.
 Checks for common issues that cause viewers to fail.
 """
 
-import struct
 import sys
+from array import array
 from typing import List, Dict, Tuple, Optional
 
 # Carriage Control
 CC = 0x5A
+_CC_BYTE = bytes([CC])
+
+# cp500 covers exactly the Latin-1 repertoire, so translating the bytes and
+# decoding as Latin-1 gives the same result as the cp500 codec, faster.
+_EBCDIC_TO_LATIN1 = bytes.maketrans(
+    bytes(range(256)), bytes(range(256)).decode('cp500').encode('latin-1')
+)
 
 # Structured Field Identifiers
 SF_TYPES = {
@@ -40,37 +47,69 @@ SF_TYPES = {
     (0xD3, 0xEE, 0x9B): ("PTX", "Presentation Text Data"),
 }
 
+# Fields that put renderable content on a page
+_PAGE_CONTENT_CODES = frozenset(('IPS', 'PTX', 'IPD'))
+
+# Begin/end pairs whose nesting is checked, in reporting order:
+# (name in the unclosed error, begin code, end code)
+_NESTED_PAIRS = (
+    ('pages', 'BPG', 'EPG'),
+    ('AEG', 'BAG', 'EAG'),
+    ('segments', 'BPS', 'EPS'),
+    ('images', 'BIO', 'EIO'),
+    ('OEG', 'BOG', 'EOG'),
+)
+
+# Code -> (index into _NESTED_PAIRS, depth change), so validate_structure
+# needs one dict lookup per field instead of a chain of comparisons
+_DEPTH_CHANGES = {
+    'BPG': (0, 1), 'EPG': (0, -1),
+    'BAG': (1, 1), 'EAG': (1, -1),
+    'BPS': (2, 1), 'EPS': (2, -1),
+    'BIO': (3, 1), 'EIO': (3, -1),
+    'BOG': (4, 1), 'EOG': (4, -1),
+}
+
 
 class AFPValidator:
     def __init__(self, data: bytes):
         self.data = data
-        self.fields: List[Dict] = []
+        # Fields are read through this view so slicing does not copy
+        self._mv = memoryview(data)
+        # Parsed structured fields as parallel columns, one entry per field
+        self.offsets = array('Q')
+        self.lengths = array('H')
+        self.codes: List[str] = []
+        self.names: List[str] = []
+        # Field index -> raw EBCDIC segment name of BPS and IPS fields
+        self.segment_names: Dict[int, bytes] = {}
         self.errors: List[str] = []
         self.warnings: List[str] = []
 
     def parse(self) -> bool:
         """Parse all structured fields."""
+        mv = self._mv
+        size = len(mv)
         offset = 0
-        field_num = 0
 
-        while offset < len(self.data):
+        while offset < size:
             # Check for carriage control
-            if self.data[offset] != CC:
-                self.errors.append(f"Offset {offset}: Expected CC (0x5A), got 0x{self.data[offset]:02X}")
+            if mv[offset] != CC:
+                self.errors.append(f"Offset {offset}: Expected CC (0x5A), got 0x{mv[offset]:02X}")
                 # Try to find next CC
-                next_cc = self.data.find(bytes([CC]), offset + 1)
+                next_cc = self.data.find(_CC_BYTE, offset + 1)
                 if next_cc == -1:
                     break
                 offset = next_cc
                 continue
 
             # Check minimum length
-            if offset + 3 > len(self.data):
+            if offset + 3 > size:
                 self.errors.append(f"Offset {offset}: Truncated structured field (no length)")
                 break
 
             # Get length
-            length = struct.unpack('>H', self.data[offset+1:offset+3])[0]
+            length = (mv[offset+1] << 8) | mv[offset+2]
 
             # Validate length
             if length < 5:
@@ -78,25 +117,25 @@ class AFPValidator:
                 offset += 3
                 continue
 
-            if offset + 1 + length > len(self.data):
-                self.errors.append(f"Offset {offset}: SF length {length} exceeds data (only {len(self.data) - offset - 1} bytes remain)")
+            if offset + 1 + length > size:
+                self.errors.append(f"Offset {offset}: SF length {length} exceeds data (only {size - offset - 1} bytes remain)")
                 break
 
             # Get SF identifier
-            sf_id = tuple(self.data[offset+3:offset+6])
+            sf_id = (mv[offset+3], mv[offset+4], mv[offset+5])
             sf_info = SF_TYPES.get(sf_id, ("UNK", f"Unknown (0x{sf_id[0]:02X}{sf_id[1]:02X}{sf_id[2]:02X})"))
-            sf_data = self.data[offset+6:offset+1+length]
-
-            field_num += 1
-            self.fields.append({
-                'num': field_num,
-                'offset': offset,
-                'length': length,
-                'sf_id': sf_id,
-                'code': sf_info[0],
-                'name': sf_info[1],
-                'data': sf_data
-            })
+
+            code = sf_info[0]
+
+            # Field data is only needed for the segment name of BPS and IPS
+            # (EBCDIC, data positions 3-10), so nothing else is kept
+            if (code == 'BPS' or code == 'IPS') and length >= 16:
+                self.segment_names[len(self.codes)] = bytes(mv[offset+9:offset+17])
+
+            self.offsets.append(offset)
+            self.lengths.append(length)
+            self.codes.append(code)
+            self.names.append(sf_info[1])
 
             offset += 1 + length
 
@@ -104,21 +143,24 @@ class AFPValidator:
 
     def validate_structure(self) -> bool:
         """Validate document structure."""
-        codes = [f['code'] for f in self.fields]
+        codes = self.codes
+        # Membership and position checks run over the code column in C; the
+        # only Python-level pass over the fields is the nesting check
+        seen_codes = set(codes)
 
         # Check for required fields
-        if 'BDT' not in codes:
+        if 'BDT' not in seen_codes:
             self.errors.append("Missing BDT (Begin Document)")
-        if 'EDT' not in codes:
+        if 'EDT' not in seen_codes:
             self.errors.append("Missing EDT (End Document)")
-        if 'BPG' not in codes:
+        if 'BPG' not in seen_codes:
             self.errors.append("Missing BPG (Begin Page) - document has no pages!")
-        if 'EPG' not in codes:
+        if 'EPG' not in seen_codes:
             self.errors.append("Missing EPG (End Page)")
 
         # Check document structure
-        bdt_idx = codes.index('BDT') if 'BDT' in codes else -1
-        edt_idx = codes.index('EDT') if 'EDT' in codes else -1
+        bdt_idx = codes.index('BDT') if 'BDT' in seen_codes else -1
+        edt_idx = codes.index('EDT') if 'EDT' in seen_codes else -1
 
         if bdt_idx > 0:
             # Only NOP should come before BDT
@@ -129,88 +171,34 @@ class AFPValidator:
         if edt_idx >= 0 and edt_idx < len(codes) - 1:
             self.warnings.append(f"Fields appear after EDT")
 
-        # Check page structure
-        page_depth = 0
-        aeg_depth = 0
-        segment_depth = 0
-        image_depth = 0
-        oeg_depth = 0
-
-        for i, f in enumerate(self.fields):
-            code = f['code']
-
-            if code == 'BPG':
-                page_depth += 1
-                if page_depth > 1:
+        # Check page structure: nesting depth per _NESTED_PAIRS entry
+        depths = [0] * len(_NESTED_PAIRS)
+
+        for i, code in enumerate(codes):
+            change = _DEPTH_CHANGES.get(code)
+            if change is not None:
+                pair, delta = change
+                depth = depths[pair] = depths[pair] + delta
+                if delta < 0:
+                    if depth < 0:
+                        self.errors.append(f"Field {i+1}: {code} without matching {_NESTED_PAIRS[pair][1]}")
+                elif depth > 1 and code == 'BPG':
                     self.errors.append(f"Field {i+1}: Nested BPG (page inside page)")
-            elif code == 'EPG':
-                page_depth -= 1
-                if page_depth < 0:
-                    self.errors.append(f"Field {i+1}: EPG without matching BPG")
-            elif code == 'BAG':
-                aeg_depth += 1
-            elif code == 'EAG':
-                aeg_depth -= 1
-                if aeg_depth < 0:
-                    self.errors.append(f"Field {i+1}: EAG without matching BAG")
-            elif code == 'BPS':
-                segment_depth += 1
-            elif code == 'EPS':
-                segment_depth -= 1
-                if segment_depth < 0:
-                    self.errors.append(f"Field {i+1}: EPS without matching BPS")
-            elif code == 'BIO':
-                image_depth += 1
-            elif code == 'EIO':
-                image_depth -= 1
-                if image_depth < 0:
-                    self.errors.append(f"Field {i+1}: EIO without matching BIO")
-            elif code == 'BOG':
-                oeg_depth += 1
-            elif code == 'EOG':
-                oeg_depth -= 1
-                if oeg_depth < 0:
-                    self.errors.append(f"Field {i+1}: EOG without matching BOG")
-
-        if page_depth != 0:
-            self.errors.append(f"Unclosed pages: {page_depth} BPG without EPG")
-        if aeg_depth != 0:
-            self.errors.append(f"Unclosed AEG: {aeg_depth} BAG without EAG")
-        if segment_depth != 0:
-            self.errors.append(f"Unclosed segments: {segment_depth} BPS without EPS")
-        if image_depth != 0:
-            self.errors.append(f"Unclosed images: {image_depth} BIO without EIO")
-        if oeg_depth != 0:
-            self.errors.append(f"Unclosed OEG: {oeg_depth} BOG without EOG")
 
-        # Check for page content
-        has_page_content = False
-        for f in self.fields:
-            if f['code'] in ['IPS', 'PTX', 'IPD']:
-                has_page_content = True
-                break
+        for (label, begin, end), depth in zip(_NESTED_PAIRS, depths):
+            if depth != 0:
+                self.errors.append(f"Unclosed {label}: {depth} {begin} without {end}")
 
-        if not has_page_content:
+        # Check for page content
+        if _PAGE_CONTENT_CODES.isdisjoint(seen_codes):
             self.warnings.append("No renderable page content found (no IPS, PTX, or IPD in page)")
 
         # Check if IPS references defined segments
         segment_names = set()
         ips_names = set()
-
-        for f in self.fields:
-            if f['code'] == 'BPS' and len(f['data']) >= 11:
-                # Extract segment name (EBCDIC, positions 3-10)
-                try:
-                    name = f['data'][3:11].decode('cp500').strip()
-                    segment_names.add(name)
-                except:
-                    pass
-            elif f['code'] == 'IPS' and len(f['data']) >= 11:
-                try:
-                    name = f['data'][3:11].decode('cp500').strip()
-                    ips_names.add(name)
-                except:
-                    pass
+        for i, segment_name in self.segment_names.items():
+            name = segment_name.translate(_EBCDIC_TO_LATIN1).decode('latin-1').strip()
+            (segment_names if codes[i] == 'BPS' else ips_names).add(name)
 
         for name in ips_names:
             if name not in segment_names:
@@ -224,13 +212,14 @@ class AFPValidator:
         print("AFP DOCUMENT VALIDATION REPORT")
         print("=" * 70)
         print(f"\nDocument size: {len(self.data)} bytes")
-        print(f"Structured fields: {len(self.fields)}")
+        print(f"Structured fields: {len(self.codes)}")
 
         # Print field summary
         print(f"\n{'#':<4} {'Offset':<8} {'Length':<8} {'Code':<6} {'Name':<35}")
         print("-" * 70)
-        for f in self.fields:
-            print(f"{f['num']:<4} {f['offset']:<8} {f['length']:<8} {f['code']:<6} {f['name']:<35}")
+        fields = zip(self.offsets, self.lengths, self.codes, self.names)
+        for num, (offset, length, code, name) in enumerate(fields, 1):
+            print(f"{num:<4} {offset:<8} {length:<8} {code:<6} {name:<35}")
 
         # Print errors
         if self.errors:
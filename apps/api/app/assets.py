@@ -5,11 +5,12 @@ from enum import Enum
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, field_validator
+from sqlalchemy import exists, update
 
 from app.aws import get_s3_client
 from app.db import get_session
 from app.models import Asset
-from app.security import sanitize_filename
+from app.security import parse_uuid, sanitize_filename
 
 
 class AssetType(str, Enum):
@@ -90,17 +91,21 @@ def presign_upload(payload: PresignUploadRequest) -> PresignUploadResponse:
 
 @router.post("/assets/commit")
 def commit_asset(payload: CommitAssetRequest) -> dict[str, str]:
-    try:
-        asset_uuid = uuid.UUID(payload.asset_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid asset_id") from exc
+    asset_uuid = parse_uuid(payload.asset_id, "asset_id")
 
     with get_session() as session:
-        asset = session.get(Asset, asset_uuid)
-        if not asset:
-            raise HTTPException(status_code=404, detail="asset not found")
+        # Write the checksum without loading the asset first; the matched
+        # row count doubles as the existence check
         if payload.checksum_sha256 is not None:
-            asset.checksum_sha256 = payload.checksum_sha256
+            found = session.execute(
+                update(Asset)
+                .where(Asset.id == asset_uuid)
+                .values(checksum_sha256=payload.checksum_sha256)
+            ).rowcount > 0
+        else:
+            found = session.query(exists().where(Asset.id == asset_uuid)).scalar()
+        if not found:
+            raise HTTPException(status_code=404, detail="asset not found")
         session.commit()
 
     return {"status": "ok"}
@@ -108,10 +113,7 @@ def commit_asset(payload: CommitAssetRequest) -> dict[str, str]:
 
 @router.get("/assets/{asset_id}/presign-download", response_model=PresignDownloadResponse)
 def presign_download(asset_id: str) -> PresignDownloadResponse:
-    try:
-        asset_uuid = uuid.UUID(asset_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid asset_id") from exc
+    asset_uuid = parse_uuid(asset_id, "asset_id")
 
     with get_session() as session:
         asset = session.get(Asset, asset_uuid)
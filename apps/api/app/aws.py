@@ -1,17 +1,31 @@
 from __future__ import annotations
 
 import os
+from functools import lru_cache
 
 import boto3
 from fastapi import HTTPException
 
 
+# Clients are thread-safe and expensive to build (service model loading,
+# endpoint resolution), so the client for the configured region is shared
+# across requests
+@lru_cache(maxsize=1)
+def _s3_client(region: str) -> boto3.client:
+    return boto3.client("s3", region_name=region)
+
+
+@lru_cache(maxsize=1)
+def _sqs_client(region: str) -> boto3.client:
+    return boto3.client("sqs", region_name=region)
+
+
 def get_s3_client() -> tuple[str, boto3.client]:
     region = os.getenv("AWS_REGION")
     bucket = os.getenv("S3_BUCKET")
     if not region or not bucket:
         raise HTTPException(status_code=500, detail="AWS_REGION or S3_BUCKET not set")
-    return bucket, boto3.client("s3", region_name=region)
+    return bucket, _s3_client(region)
 
 
 def get_sqs_client() -> tuple[str, boto3.client]:
@@ -19,4 +33,4 @@ def get_sqs_client() -> tuple[str, boto3.client]:
     queue_url = os.getenv("SQS_QUEUE_URL")
     if not region or not queue_url:
         raise HTTPException(status_code=500, detail="AWS_REGION or SQS_QUEUE_URL not set")
-    return queue_url, boto3.client("sqs", region_name=region)
+    return queue_url, _sqs_client(region)
@@ -0,0 +1,61 @@
+"""
+Bilevel conversion for IOCA image data
+
+Thresholds 8-bit grayscale into 1-bit WhiteIsZero rows, shared by the AFP
+document generator and the page segment generator so both emit the same
+image bits.
+"""
+
+from typing import Tuple
+
+
+# Maps each gray byte to an ASCII binary digit: '1' (black) below 128, else '0'
+_BILEVEL_BITS = bytes.maketrans(bytes(range(256)), b'1' * 128 + b'0' * 128)
+
+# Pixels converted per band in to_bilevel
+_BILEVEL_BAND_PIXELS = 1 << 16
+
+
+def to_bilevel(gray: bytes, w: int, h: int, fill: int = 0xFF) -> bytes:
+    """
+    Convert grayscale to 1-bit bilevel (WhiteIsZero).
+
+    Rows are padded out to a whole byte, and short data completed, with
+    pixels of gray value fill (white by default).
+    """
+    bpr = (w + 7) // 8
+    n = w * h
+    if not n:
+        return bytes(bpr * h)
+
+    # Bands are cut from a view, so the image itself is never copied whole
+    view = memoryview(gray)
+
+    # Threshold each pixel to a '0'/'1' digit in C, then let int() pack the
+    # digit string into bits. Work in bands of rows so the digit string (one
+    # byte per pixel) stays small instead of spanning the whole image.
+    row_pad = bytes([fill]).translate(_BILEVEL_BITS) * (bpr * 8 - w)
+    rows_per_band = max(1, _BILEVEL_BAND_PIXELS // w)
+    bands = []
+    for y in range(0, h, rows_per_band):
+        rows = min(rows_per_band, h - y)
+        band = bytes(view[y * w:(y + rows) * w])
+        if len(band) < rows * w:
+            band += bytes([fill]) * (rows * w - len(band))
+        bits = band.translate(_BILEVEL_BITS)
+        if row_pad:
+            bits = row_pad.join([bits[r * w:(r + 1) * w] for r in range(rows)]) + row_pad
+        bands.append(int(bits, 2).to_bytes(bpr * rows, 'big'))
+
+    return b''.join(bands)
+
+
+def image_to_bilevel(image_data: bytes, width: int, height: int) -> Tuple[bytes, int]:
+    """Threshold an image for IOCA with byte-aligned rows; returns (bilevel, width)."""
+    padded_width = ((width + 7) // 8) * 8
+    if padded_width == width:
+        return to_bilevel(image_data, width, height), width
+
+    # Padding columns are gray 0, i.e. black, and so are missing pixels, as
+    # when the image was first copied into a zero-filled padded buffer
+    return to_bilevel(image_data, width, height, fill=0x00), padded_width
@@ -4,13 +4,21 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 
+_BASE_DIR = Path(__file__).resolve().parents[1]
+_ENV_PATH = _BASE_DIR / ".env"
+_ENV_LOCAL_PATH = _BASE_DIR / ".env.local"
+
+_loaded = False
+
 
 def load_env() -> None:
-    base_dir = Path(__file__).resolve().parents[1]
-    env_path = base_dir / ".env"
-    env_local_path = base_dir / ".env.local"
+    # Repeated calls (e.g. from several entry points) do not re-read the files
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
 
-    if env_path.exists():
-        load_dotenv(env_path)
-    if env_local_path.exists():
-        load_dotenv(env_local_path, override=True)
+    if _ENV_PATH.exists():
+        load_dotenv(_ENV_PATH)
+    if _ENV_LOCAL_PATH.exists():
+        load_dotenv(_ENV_LOCAL_PATH, override=True)
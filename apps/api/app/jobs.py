@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-import uuid
 from typing import Any
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from sqlalchemy import exists, func, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.db import get_session
 from app.models import (
@@ -14,6 +15,7 @@ from app.models import (
     JobTleConfig,
     TemplateProfile,
 )
+from app.security import parse_uuid
 
 
 router = APIRouter()
@@ -56,10 +58,7 @@ class UpdateReturnAddressRequest(BaseModel):
 
 @router.post("/template-profiles")
 def create_template_profile(payload: CreateTemplateProfileRequest) -> dict[str, Any]:
-    try:
-        asset_id = uuid.UUID(payload.template_asset_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid template_asset_id") from exc
+    asset_id = parse_uuid(payload.template_asset_id, "template_asset_id")
 
     from app.models import Asset
 
@@ -89,10 +88,7 @@ def create_template_profile(payload: CreateTemplateProfileRequest) -> dict[str,
 
 @router.get("/template-profiles/{template_profile_id}")
 def get_template_profile(template_profile_id: str) -> dict[str, Any]:
-    try:
-        profile_id = uuid.UUID(template_profile_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid template_profile_id") from exc
+    profile_id = parse_uuid(template_profile_id, "template_profile_id")
 
     with get_session() as session:
         profile = session.get(TemplateProfile, profile_id)
@@ -111,10 +107,7 @@ def get_template_profile(template_profile_id: str) -> dict[str, Any]:
 
 @router.post("/jobs")
 def create_job(payload: CreateJobRequest) -> dict[str, Any]:
-    try:
-        template_profile_id = uuid.UUID(payload.template_profile_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid template_profile_id") from exc
+    template_profile_id = parse_uuid(payload.template_profile_id, "template_profile_id")
 
     with get_session() as session:
         template_profile = session.get(TemplateProfile, template_profile_id)
@@ -130,23 +123,26 @@ def create_job(payload: CreateJobRequest) -> dict[str, Any]:
 
 @router.put("/jobs/{job_id}/mappings")
 def update_job_mappings(job_id: str, payload: UpdateMappingsRequest) -> dict[str, str]:
-    try:
-        job_uuid = uuid.UUID(job_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid job_id") from exc
+    job_uuid = parse_uuid(job_id, "job_id")
 
     with get_session() as session:
         job = session.get(Job, job_uuid)
         if not job:
             raise HTTPException(status_code=404, detail="job not found")
         session.query(JobMapping).filter(JobMapping.job_id == job_uuid).delete()
-        for mapping in payload.mappings:
-            session.add(
-                JobMapping(
-                    job_id=job_uuid,
-                    placeholder_name=mapping.placeholder_name,
-                    expression_json=mapping.expression_json,
-                )
+        if payload.mappings:
+            # One executemany, sent as multi-row INSERTs, instead of an ORM
+            # object and INSERT per mapping
+            session.execute(
+                insert(JobMapping),
+                [
+                    {
+                        "job_id": job_uuid,
+                        "placeholder_name": mapping.placeholder_name,
+                        "expression_json": mapping.expression_json,
+                    }
+                    for mapping in payload.mappings
+                ],
             )
         session.commit()
 
@@ -155,26 +151,26 @@ def update_job_mappings(job_id: str, payload: UpdateMappingsRequest) -> dict[str
 
 @router.put("/jobs/{job_id}/tle")
 def update_job_tle(job_id: str, payload: UpdateTleRequest) -> dict[str, str]:
-    try:
-        job_uuid = uuid.UUID(job_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid job_id") from exc
+    job_uuid = parse_uuid(job_id, "job_id")
 
     with get_session() as session:
         job = session.get(Job, job_uuid)
         if not job:
             raise HTTPException(status_code=404, detail="job not found")
-        tle = session.get(JobTleConfig, job_uuid)
-        if not tle:
-            tle = JobTleConfig(job_id=job_uuid)
-            session.add(tle)
-        tle.name_expr = payload.name_expr
-        tle.addr1_expr = payload.addr1_expr
-        tle.addr2_expr = payload.addr2_expr
-        tle.addr3_expr = payload.addr3_expr
-        tle.return_addr1_expr = payload.return_addr1_expr
-        tle.return_addr2_expr = payload.return_addr2_expr
-        tle.return_addr3_expr = payload.return_addr3_expr
+        values = {
+            "name_expr": payload.name_expr,
+            "addr1_expr": payload.addr1_expr,
+            "addr2_expr": payload.addr2_expr,
+            "addr3_expr": payload.addr3_expr,
+            "return_addr1_expr": payload.return_addr1_expr,
+            "return_addr2_expr": payload.return_addr2_expr,
+            "return_addr3_expr": payload.return_addr3_expr,
+        }
+        session.execute(
+            pg_insert(JobTleConfig)
+            .values(job_id=job_uuid, **values)
+            .on_conflict_do_update(index_elements=[JobTleConfig.job_id], set_=values)
+        )
         session.commit()
 
     return {"status": "ok"}
@@ -182,10 +178,7 @@ def update_job_tle(job_id: str, payload: UpdateTleRequest) -> dict[str, str]:
 
 @router.get("/jobs/{job_id}/tle")
 def get_job_tle(job_id: str) -> dict[str, Any]:
-    try:
-        job_uuid = uuid.UUID(job_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid job_id") from exc
+    job_uuid = parse_uuid(job_id, "job_id")
 
     with get_session() as session:
         tle = session.get(JobTleConfig, job_uuid)
@@ -205,22 +198,26 @@ def get_job_tle(job_id: str) -> dict[str, Any]:
 
 @router.put("/jobs/{job_id}/return-address")
 def upsert_return_address(job_id: str, payload: UpdateReturnAddressRequest) -> dict[str, str]:
-    try:
-        job_uuid = uuid.UUID(job_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid job_id") from exc
+    job_uuid = parse_uuid(job_id, "job_id")
 
     with get_session() as session:
         job = session.get(Job, job_uuid)
         if not job:
             raise HTTPException(status_code=404, detail="job not found")
-        address = session.get(JobReturnAddress, job_uuid)
-        if not address:
-            address = JobReturnAddress(job_id=job_uuid)
-            session.add(address)
-        address.return_addr1 = payload.return_addr1
-        address.return_addr2 = payload.return_addr2
-        address.return_addr3 = payload.return_addr3
+        values = {
+            "return_addr1": payload.return_addr1,
+            "return_addr2": payload.return_addr2,
+            "return_addr3": payload.return_addr3,
+        }
+        session.execute(
+            pg_insert(JobReturnAddress)
+            .values(job_id=job_uuid, **values)
+            .on_conflict_do_update(
+                index_elements=[JobReturnAddress.job_id],
+                # onupdate does not fire for ON CONFLICT, so bump it here
+                set_={**values, "updated_at": func.now()},
+            )
+        )
         session.commit()
 
     return {"status": "ok"}
@@ -228,10 +225,7 @@ def upsert_return_address(job_id: str, payload: UpdateReturnAddressRequest) -> d
 
 @router.get("/jobs/{job_id}/return-address")
 def get_return_address(job_id: str) -> dict[str, Any]:
-    try:
-        job_uuid = uuid.UUID(job_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid job_id") from exc
+    job_uuid = parse_uuid(job_id, "job_id")
 
     with get_session() as session:
         address = session.get(JobReturnAddress, job_uuid)
@@ -248,10 +242,7 @@ def get_return_address(job_id: str) -> dict[str, Any]:
 
 @router.post("/jobs/{job_id}/validate")
 def validate_job(job_id: str) -> dict[str, Any]:
-    try:
-        job_uuid = uuid.UUID(job_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid job_id") from exc
+    job_uuid = parse_uuid(job_id, "job_id")
 
     errors: list[str] = []
     warnings: list[str] = []
@@ -261,8 +252,9 @@ def validate_job(job_id: str) -> dict[str, Any]:
         if not job:
             raise HTTPException(status_code=404, detail="job not found")
 
-        mappings_count = session.query(JobMapping).filter(JobMapping.job_id == job_uuid).count()
-        if mappings_count == 0:
+        # Only whether any mapping exists matters; EXISTS stops at the first row
+        has_mappings = session.query(exists().where(JobMapping.job_id == job_uuid)).scalar()
+        if not has_mappings:
             warnings.append("no mappings configured")
 
         tle = session.get(JobTleConfig, job_uuid)
@@ -283,7 +275,7 @@ def validate_job(job_id: str) -> dict[str, Any]:
             errors.append("return_addr1 is required")
 
     return {
-        "missing_mappings_count": 0 if mappings_count > 0 else 1,
+        "missing_mappings_count": 0 if has_mappings else 1,
         "has_tle_config": has_tle_config,
         "has_return_address": has_return_address,
         "errors": errors,
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from typing import Callable, Sequence
+
+from alembic import op
+from sqlalchemy import Select
+from sqlalchemy.engine import Connection, Row
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def run_batched(
+    select_stmt: Select,
+    key_column: ColumnElement,
+    write_batch: Callable[[Connection, Sequence[Row]], None],
+    batch_size: int = 100,
+) -> int:
+    """
+    Backfill helper for data-bearing migrations.
+
+    Pages through select_stmt in key_column order, batch_size rows at a
+    time, and passes each page to write_batch. Runs inside Alembic's
+    autocommit_block, so the connection is in AUTOCOMMIT and every
+    statement commits on its own instead of the whole backfill sitting in
+    the migration-wide transaction.
+
+    Nothing groups the statements of one page: if write_batch issues
+    several and one fails, that page is left half-applied. Earlier pages
+    stay committed while alembic_version is not stamped, so a failed
+    backfill is rerun from the first row. write_batch must therefore be
+    idempotent (e.g. upserts, or writes guarded by what is already there).
+
+    key_column must be unique and part of the selected columns; pages are
+    fetched with keyset pagination (key_column > last seen key), which keeps
+    each query cheap regardless of how far the backfill has progressed.
+
+    Returns the number of rows processed.
+
+    Example (in a revision's upgrade()):
+
+        run_batched(
+            sa.select(job_tle_config.c.job_id, job_tle_config.c.return_addr1_expr),
+            job_tle_config.c.job_id,
+            lambda conn, rows: conn.execute(sa.insert(job_return_address), [...]),
+        )
+    """
+    total = 0
+    last_key = None
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        while True:
+            stmt = select_stmt.order_by(key_column).limit(batch_size)
+            if last_key is not None:
+                stmt = stmt.where(key_column > last_key)
+            rows = connection.execute(stmt).all()
+            if not rows:
+                break
+            write_batch(connection, rows)
+            total += len(rows)
+            last_key = rows[-1]._mapping[key_column]
+    return total
@@ -63,7 +63,7 @@ class JobMapping(Base):
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
     )
     job_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("jobs.id")
+        UUID(as_uuid=True), ForeignKey("jobs.id"), index=True
     )
     placeholder_name: Mapped[str] = mapped_column(String(128))
     expression_json: Mapped[dict] = mapped_column(JSONB)
@@ -111,7 +111,7 @@ class JobRun(Base):
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
     )
     job_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True), ForeignKey("jobs.id")
+        UUID(as_uuid=True), ForeignKey("jobs.id"), index=True
     )
     status: Mapped[str] = mapped_column(String(50))
     progress: Mapped[int | None] = mapped_column(Integer, nullable=True)
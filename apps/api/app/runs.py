@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 import json
-import uuid
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
 from app.aws import get_s3_client, get_sqs_client
 from app.db import get_session
 from app.models import Job, JobRun
+from app.security import parse_uuid
 
 
 router = APIRouter()
@@ -32,10 +32,7 @@ class RunOutputsResponse(BaseModel):
 
 @router.post("/jobs/{job_id}/runs", response_model=CreateRunResponse)
 def create_job_run(job_id: str) -> CreateRunResponse:
-    try:
-        job_uuid = uuid.UUID(job_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid job_id") from exc
+    job_uuid = parse_uuid(job_id, "job_id")
 
     with get_session() as session:
         job = session.get(Job, job_uuid)
@@ -56,10 +53,7 @@ def create_job_run(job_id: str) -> CreateRunResponse:
 
 @router.get("/runs/{run_id}", response_model=RunStatusResponse)
 def get_run(run_id: str) -> RunStatusResponse:
-    try:
-        run_uuid = uuid.UUID(run_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid run_id") from exc
+    run_uuid = parse_uuid(run_id, "run_id")
 
     with get_session() as session:
         run = session.get(JobRun, run_uuid)
@@ -77,10 +71,7 @@ def get_run(run_id: str) -> RunStatusResponse:
 
 @router.get("/runs/{run_id}/outputs", response_model=RunOutputsResponse)
 def get_run_outputs(run_id: str) -> RunOutputsResponse:
-    try:
-        run_uuid = uuid.UUID(run_id)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="invalid run_id") from exc
+    run_uuid = parse_uuid(run_id, "run_id")
 
     with get_session() as session:
         run = session.get(JobRun, run_uuid)
@@ -13,6 +13,7 @@ import os
 import re
 import secrets
 import logging
+import uuid
 from typing import Optional
 
 from fastapi import HTTPException, Security, Request, Response
@@ -147,6 +148,14 @@ def validate_file_size(file_size: Optional[int], max_size: int = MAX_UPLOAD_SIZE
         )
 
 
+def parse_uuid(value: str, field_name: str) -> uuid.UUID:
+    """Parse an ID from a path or request body, rejecting malformed ones with a 400."""
+    try:
+        return uuid.UUID(value)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"invalid {field_name}") from exc
+
+
 # Magic bytes for file type validation
 FILE_SIGNATURES = {
     # CSV has no magic bytes, but we check for text
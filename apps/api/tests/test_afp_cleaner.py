@@ -0,0 +1,25 @@
+from app.afp_cleaner import _is_s_number, clean_afp
+
+S_NUMBER = "S1234567".encode("cp500")
+
+
+def _sf(sf_id: bytes, data: bytes) -> bytes:
+    return b"\x5a" + (5 + len(data)).to_bytes(2, "big") + sf_id + data
+
+
+def test_is_s_number() -> None:
+    assert _is_s_number(b"\x00\x00" + S_NUMBER)
+    assert not _is_s_number(S_NUMBER[:-1])
+    assert not _is_s_number("S123456X".encode("cp500"))
+
+
+def test_clean_afp_removes_index_fields_with_s_numbers() -> None:
+    kept = _sf(b"\xd3\xa8\xaf", b"\x00" * 8)
+    bng = _sf(b"\xd3\xa8\x5f", b"\x00\x00" + S_NUMBER)
+    eng_without_s_number = _sf(b"\xd3\xa9\x5f", b"\x00" * 8)
+
+    cleaned, stats = clean_afp(kept + bng + eng_without_s_number)
+
+    assert cleaned == kept + eng_without_s_number
+    assert stats["total_removed"] == 1
+    assert stats["total_kept"] == 2
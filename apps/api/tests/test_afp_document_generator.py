@@ -0,0 +1,48 @@
+import io
+from datetime import datetime
+from unittest.mock import patch
+
+from app.afp_document_generator import (
+    generate_afp_document,
+    generate_afp_with_resources,
+    generate_inline_image,
+)
+from app.bilevel import to_bilevel
+
+
+def test_generate_afp_document_streams_pages_to_output() -> None:
+    pages = [
+        {"image_data": bytes(range(256)) * 4, "width": 30, "height": 30, "tle_data": {"mailing_name": "A"}},
+        {"tle_data": {"mailing_name": "B"}},
+    ]
+    output = io.BytesIO()
+
+    assert generate_afp_document(pages, output=output) is None
+    assert output.getvalue() == generate_afp_document(pages)
+
+
+def test_generate_afp_with_resources_streams_to_output() -> None:
+    pages = [
+        {"image_data": bytes(range(256)) * 4, "width": 30, "height": 30, "tle_data": {"mailing_name": "A"}},
+        {"tle_data": {"mailing_name": "B"}},
+    ]
+    output = io.BytesIO()
+
+    with patch("app.afp_document_generator.datetime") as fake_datetime:
+        fake_datetime.now.return_value = datetime(2024, 1, 2, 3, 4, 5)
+        assert generate_afp_with_resources(pages, output=output) is None
+        assert output.getvalue() == generate_afp_with_resources(pages)
+
+
+def test_generate_inline_image_passes_bilevel_data_through() -> None:
+    gray = bytes([0] + [255] * 8 + [0]) * 2
+    bilevel = to_bilevel(gray, 10, 2, fill=0x00)
+
+    assert generate_inline_image(bilevel, 10, 2, pixel_format="bilevel") == generate_inline_image(gray, 10, 2)
+
+
+def test_generate_inline_image_reads_two_dimensional_buffers() -> None:
+    gray = bytes(range(0, 250, 5)) * 3
+    rows = memoryview(gray).cast("B", (10, 15))
+
+    assert generate_inline_image(rows, 15, 10) == generate_inline_image(gray, 15, 10)
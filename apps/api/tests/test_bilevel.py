@@ -0,0 +1,23 @@
+from app.afp_generator import generate_page_segment
+from app.bilevel import image_to_bilevel, to_bilevel
+
+
+def test_to_bilevel_packs_rows_white_is_zero() -> None:
+    # 10x2 image: row 0 has black pixels at x=0 and x=9, row 1 is cut short
+    gray = bytes([0] + [255] * 8 + [0]) + bytes([100, 200])
+
+    assert to_bilevel(gray, 10, 2) == bytes([0x80, 0x40, 0x80, 0x00])
+
+
+def test_image_to_bilevel_pads_unaligned_width_black() -> None:
+    gray = bytes([255] * 10) * 2
+
+    assert image_to_bilevel(gray, 10, 2) == (bytes([0x00, 0x3F, 0x00, 0x3F]), 16)
+    assert image_to_bilevel(gray[:8], 8, 1) == (bytes([0x00]), 8)
+
+
+def test_generate_page_segment_embeds_bilevel_rows() -> None:
+    gray = bytes([0] + [255] * 8 + [0]) * 2
+    bilevel, _ = image_to_bilevel(gray, 10, 2)
+
+    assert bilevel in generate_page_segment(gray, 10, 2, segment_name="LOGO")
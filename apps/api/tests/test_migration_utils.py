@@ -0,0 +1,42 @@
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from app.migration_utils import run_batched
+
+
+def _run_batched(ids: list[int], batch_size: int) -> tuple[int, list[list[int]]]:
+    engine = sa.create_engine("sqlite://")
+    metadata = sa.MetaData()
+    source = sa.Table("source", metadata, sa.Column("id", sa.Integer, primary_key=True))
+    pages: list[list[int]] = []
+
+    with engine.connect() as connection:
+        metadata.create_all(connection)
+        if ids:
+            connection.execute(sa.insert(source), [{"id": i} for i in ids])
+        connection.commit()
+
+        with Operations.context(MigrationContext.configure(connection)):
+            total = run_batched(
+                sa.select(source.c.id),
+                source.c.id,
+                lambda conn, rows: pages.append([row.id for row in rows]),
+                batch_size=batch_size,
+            )
+
+    return total, pages
+
+
+def test_run_batched_pages_in_key_order_with_partial_last_page() -> None:
+    # Keys are inserted out of order and with gaps, so pages have to come
+    # from key_column > last seen key rather than from offsets
+    assert _run_batched([30, 5, 12, 40, 7], batch_size=2) == (5, [[5, 7], [12, 30], [40]])
+
+
+def test_run_batched_stops_after_exactly_full_last_page() -> None:
+    assert _run_batched([1, 2, 3, 4], batch_size=2) == (4, [[1, 2], [3, 4]])
+
+
+def test_run_batched_empty_select() -> None:
+    assert _run_batched([], batch_size=2) == (0, [])
@@ -7,11 +7,17 @@ Compatible with SCRIPT/VS, DCF, and 3820.
 from __future__ import annotations
 
 import struct
+from datetime import datetime
+from functools import lru_cache
+
 from PIL import Image
 
 CRLF = b"\x0d\x0a"
 CC = 0x5A
 
+_SF_HEADER = struct.Struct(">BH")
+_U16 = struct.Struct(">H")
+
 SF_BPS = bytes([0xD3, 0xA8, 0x5F])
 SF_EPS = bytes([0xD3, 0xA9, 0x5F])
 SF_BIO = bytes([0xD3, 0xA8, 0xFB])
@@ -27,128 +33,175 @@ SF_NOP = bytes([0xD3, 0xEE, 0xEE])
 
 
 def _sf(sf_id: bytes, data: bytes = b"") -> bytes:
-    length = 5 + len(data)
-    return bytes([CC]) + struct.pack(">H", length) + sf_id + data + CRLF
+    return b"".join((_SF_HEADER.pack(CC, 5 + len(data)), sf_id, data, CRLF))
 
 
-def _build_bps(name: str) -> bytes:
+@lru_cache(maxsize=32)
+def _named_sf_data(name: str) -> bytes:
+    # BPS, EPS and BIO of a segment share this, so the name is encoded once
     ebcdic_name = name.upper()[:8].ljust(8).encode("cp500")
-    data = bytes([0x00, 0x00, 0x00]) + ebcdic_name
-    return _sf(SF_BPS, data)
+    return bytes([0x00, 0x00, 0x00]) + ebcdic_name
 
 
-def _build_nop_records(name: str) -> bytes:
-    from datetime import datetime
+def _build_bps(name: str) -> bytes:
+    return _sf(SF_BPS, _named_sf_data(name))
 
-    result = bytearray()
-    now = datetime.now()
-    timestamp = now.strftime("%m/%d/%Y   %I:%M:%S %p")
-    comment = f"{name.upper()[:8].ljust(8)} (c)2025 Copyright by Elevance Health {timestamp}"
-    comment = comment[:86].ljust(86)
 
-    ebcdic_comment = comment.encode("cp500")
-    data1 = bytes([0x00, 0x00, 0x00]) + ebcdic_comment
-    result.extend(_sf(SF_NOP, data1))
+@lru_cache(maxsize=32)
+def _nop_prefixes(name: str) -> tuple[bytes, bytes, int]:
+    # Everything before the timestamp is fixed per name
+    prefix = f"{name.upper()[:8].ljust(8)} (c)2025 Copyright by Elevance Health "
+    flags = bytes([0x00, 0x00, 0x00])
+    return flags + prefix.encode("cp500"), flags + prefix.encode("ascii"), len(prefix)
 
-    ascii_comment = comment.encode("ascii")
-    data2 = bytes([0x00, 0x00, 0x00]) + ascii_comment
-    result.extend(_sf(SF_NOP, data2))
 
-    return bytes(result)
+def _nop_timestamp(now: datetime) -> str:
+    # Same text as now.strftime("%m/%d/%Y   %I:%M:%S %p")
+    return "%02d/%02d/%04d   %02d:%02d:%02d %s" % (
+        now.month,
+        now.day,
+        now.year,
+        now.hour % 12 or 12,
+        now.minute,
+        now.second,
+        "PM" if now.hour >= 12 else "AM",
+    )
+
+
+def _build_nop_records(name: str) -> bytes:
+    ebcdic_prefix, ascii_prefix, prefix_length = _nop_prefixes(name)
+    tail_length = 86 - prefix_length
+    tail = _nop_timestamp(datetime.now())[:tail_length].ljust(tail_length)
+
+    return b"".join(
+        (
+            _sf(SF_NOP, ebcdic_prefix + tail.encode("cp500")),
+            _sf(SF_NOP, ascii_prefix + tail.encode("ascii")),
+        )
+    )
 
 
 def _build_eps(name: str) -> bytes:
-    ebcdic_name = name.upper()[:8].ljust(8).encode("cp500")
-    data = bytes([0x00, 0x00, 0x00]) + ebcdic_name
-    return _sf(SF_EPS, data)
+    return _sf(SF_EPS, _named_sf_data(name))
 
 
 def _build_bio(name: str) -> bytes:
-    ebcdic_name = name.upper()[:8].ljust(8).encode("cp500")
-    data = bytes([0x00, 0x00, 0x00]) + ebcdic_name
-    return _sf(SF_BIO, data)
+    return _sf(SF_BIO, _named_sf_data(name))
+
+
+# Structured fields that carry only 3 flag bytes never change
+_EIO_SF = _sf(SF_EIO, bytes([0x00, 0x00, 0x00]))
+_BOG_SF = _sf(SF_BOG, bytes([0x00, 0x00, 0x00]))
+_EOG_SF = _sf(SF_EOG, bytes([0x00, 0x00, 0x00]))
 
 
 def _build_eio() -> bytes:
-    return _sf(SF_EIO, bytes([0x00, 0x00, 0x00]))
+    return _EIO_SF
 
 
 def _build_bog() -> bytes:
-    return _sf(SF_BOG, bytes([0x00, 0x00, 0x00]))
+    return _BOG_SF
 
 
 def _build_eog() -> bytes:
-    return _sf(SF_EOG, bytes([0x00, 0x00, 0x00]))
+    return _EOG_SF
+
+
+# OBD, OBP and IDD end the same way: a pair of 2-byte values (size or
+# position) followed by the 0x45 resolution triplet
+_PAIR_AND_RESOLUTION = struct.Struct(">HH3sHH")
+_RESOLUTION_TRIPLET = bytes([0x0A, 0x45, 0x01])
+_OBD_PREFIX = bytes([0x00, 0x00, 0x00, 0x03, 0x43, 0x01, 0x06, 0x44, 0x00])
+_OBP_PREFIX = bytes([0x00, 0x00, 0x00, 0x06, 0x3F, 0x00])
+_IDD_PREFIX = bytes([0x00, 0x00, 0x00, 0x06, 0x01, 0x00])
 
 
 def _build_obd(width: int, height: int, resolution: int = 240) -> bytes:
-    data = bytearray()
-    data.extend([0x00, 0x00, 0x00])
-    data.extend([0x03, 0x43, 0x01])
-    data.extend([0x06, 0x44, 0x00])
-    data.extend(struct.pack(">H", width))
-    data.extend(struct.pack(">H", height))
-    data.extend([0x0A, 0x45, 0x01])
-    data.extend(struct.pack(">H", resolution))
-    data.extend(struct.pack(">H", resolution))
-    return _sf(SF_OBD, bytes(data))
+    data = _PAIR_AND_RESOLUTION.pack(width, height, _RESOLUTION_TRIPLET, resolution, resolution)
+    return _sf(SF_OBD, _OBD_PREFIX + data)
 
 
 def _build_obp(x: int, y: int, resolution: int = 240) -> bytes:
-    data = bytearray()
-    data.extend([0x00, 0x00, 0x00])
-    data.extend([0x06, 0x3F, 0x00])
-    data.extend(struct.pack(">H", x))
-    data.extend(struct.pack(">H", y))
-    data.extend([0x0A, 0x45, 0x01])
-    data.extend(struct.pack(">H", resolution))
-    data.extend(struct.pack(">H", resolution))
-    return _sf(SF_OBP, bytes(data))
+    data = _PAIR_AND_RESOLUTION.pack(x, y, _RESOLUTION_TRIPLET, resolution, resolution)
+    return _sf(SF_OBP, _OBP_PREFIX + data)
 
 
 def _build_idd(width: int, height: int, resolution: int = 240) -> bytes:
-    data = bytearray()
-    data.extend([0x00, 0x00, 0x00])
-    data.extend([0x06, 0x01, 0x00])
-    data.extend(struct.pack(">H", width))
-    data.extend(struct.pack(">H", height))
-    data.extend([0x0A, 0x45, 0x01])
-    data.extend(struct.pack(">H", resolution))
-    data.extend(struct.pack(">H", resolution))
-    return _sf(SF_IDD, bytes(data))
+    data = _PAIR_AND_RESOLUTION.pack(width, height, _RESOLUTION_TRIPLET, resolution, resolution)
+    return _sf(SF_IDD, _IDD_PREFIX + data)
+
+
+@lru_cache(maxsize=32)
+def _build_oeg(width: int, height: int, resolution: int) -> bytes:
+    # The object environment group depends only on geometry, which repeats
+    # for pages of the same size and resolution
+    return b"".join(
+        (
+            _build_bog(),
+            _build_obd(width, height, resolution),
+            _build_obp(0, 0, resolution),
+            _build_idd(width, height, resolution),
+            _build_eog(),
+        )
+    )
 
 
 def _build_ipd_records(image_data: bytes, width: int, height: int, resolution: int = 240, use_g4: bool = True) -> bytes:
     data = bytearray()
+    _append_ipd_records(data, image_data, width, height, resolution, use_g4)
+    return bytes(data)
+
+
+def _append_ipd_records(
+    data: bytearray, image_data: bytes, width: int, height: int, resolution: int = 240, use_g4: bool = True
+) -> None:
     header = bytearray()
     header.extend([0x00, 0x00, 0x00])
     header.extend([0x0A, 0x01, 0x01])
-    header.extend(struct.pack(">H", width))
-    header.extend(struct.pack(">H", height))
-    header.extend(struct.pack(">H", resolution))
-    header.extend(struct.pack(">H", resolution))
+    header.extend(_U16.pack(width))
+    header.extend(_U16.pack(height))
+    header.extend(_U16.pack(resolution))
+    header.extend(_U16.pack(resolution))
     header.extend([0x01 if use_g4 else 0x00])
     data.extend(_sf(SF_IPD, bytes(header)))
 
     row_bytes = width // 8
+    if row_bytes and height and len(image_data) >= row_bytes * height:
+        # Every row SF has the same header, so the rows are joined with the
+        # CRLF + header separating them instead of building one SF per row
+        row_header = _SF_HEADER.pack(CC, 5 + row_bytes) + SF_IPD
+        view = memoryview(image_data)
+        rows = [view[offset : offset + row_bytes] for offset in range(0, row_bytes * height, row_bytes)]
+        data += row_header
+        data += (CRLF + row_header).join(rows)
+        data += CRLF
+        return
+
     for row in range(height):
         offset = row * row_bytes
         row_data = image_data[offset : offset + row_bytes]
         data.extend(_sf(SF_IPD, row_data))
-    return bytes(data)
+
+
+@lru_cache(maxsize=4)
+def _bilevel_bits(threshold: int) -> bytes:
+    # Maps each gray byte to an ASCII binary digit: "1" (black) below threshold
+    return bytes.maketrans(bytes(range(256)), b"1" * threshold + b"0" * (256 - threshold))
 
 
 def _to_bilevel(image_data: bytes, width: int, height: int, threshold: int = 128) -> bytes:
+    # Threshold every pixel to a "0"/"1" digit in C, then let int() pack the
+    # digits into bits; width is a multiple of 8, so rows pack back to back
+    if width % 8:
+        raise ValueError(f"width {width} is not byte-aligned")
     row_bytes = width // 8
-    output = bytearray(row_bytes * height)
-    for y in range(height):
-        for x in range(width):
-            pixel = image_data[y * width + x]
-            if pixel < threshold:
-                byte_index = y * row_bytes + (x // 8)
-                bit_index = 7 - (x % 8)
-                output[byte_index] |= 1 << bit_index
-    return bytes(output)
+    pixels = width * height
+    if len(image_data) < pixels:
+        raise ValueError(f"image data is {len(image_data)} bytes, expected {pixels}")
+    if not pixels:
+        return b""
+    bits = bytes(image_data[:pixels]).translate(_bilevel_bits(threshold))
+    return int(bits, 2).to_bytes(row_bytes * height, "big")
 
 
 def generate_page_segment(
@@ -166,12 +219,13 @@ def generate_page_segment(
 
     padded_width = ((width + 7) // 8) * 8
     if padded_width != width:
-        padded_data = bytearray(padded_width * height)
-        for y in range(height):
-            for x in range(width):
-                if y * width + x < len(image_data):
-                    padded_data[y * padded_width + x] = image_data[y * width + x]
-        image_data = bytes(padded_data)
+        # Zero-fill missing pixels and the padding columns, one row at a time
+        pixels = width * height
+        image_data = bytes(image_data[:pixels]).ljust(pixels, b"\x00")
+        row_pad = bytes(padded_width - width)
+        image_data = row_pad.join(
+            [image_data[y * width : (y + 1) * width] for y in range(height)]
+        ) + row_pad
         width = padded_width
 
     bilevel_data = _to_bilevel(image_data, width, height)
@@ -180,12 +234,8 @@ def generate_page_segment(
     result.extend(_build_bps(segment_name))
     result.extend(_build_nop_records(segment_name))
     result.extend(_build_bio(segment_name))
-    result.extend(_build_bog())
-    result.extend(_build_obd(width, height, x_resolution))
-    result.extend(_build_obp(0, 0, x_resolution))
-    result.extend(_build_idd(width, height, x_resolution))
-    result.extend(_build_eog())
-    result.extend(_build_ipd_records(bilevel_data, width, height, x_resolution, use_g4=True))
+    result.extend(_build_oeg(width, height, x_resolution))
+    _append_ipd_records(result, bilevel_data, width, height, x_resolution, use_g4=True)
     result.extend(_build_eio())
     result.extend(_build_eps(segment_name))
 
@@ -17,7 +17,7 @@ class JobRun(Base):
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True), primary_key=True, default=uuid.uuid4
     )
-    job_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("jobs.id"))
+    job_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("jobs.id"), index=True)
     status: Mapped[str] = mapped_column(String(50))
     progress: Mapped[int | None] = mapped_column(Integer, nullable=True)
     output_s3_key: Mapped[str | None] = mapped_column(String(512), nullable=True)